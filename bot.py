@@ -1,6 +1,7 @@
 import discord
 from discord import app_commands 
 from services.chat_service import ChatService
+from services.edit_throttle import EditThrottle
 import os
 from dotenv import load_dotenv
 import logging
@@ -11,6 +12,11 @@ logger = logging.getLogger('discord')
 
 load_dotenv()
 
+# Minimum seconds between progressive edits while a reply streams in
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+
+DECREE_PROMPT = "Issue a royal decree!"
+
 class CremeBot(discord.Client):
     def __init__(self):
         intents = discord.Intents.default()
@@ -23,6 +29,14 @@ class CremeBot(discord.Client):
 
     async def setup_hook(self):
         await self.tree.sync()
+        # Decrees are pre-generated in batches while the backend is quiet
+        self.decree_pool = self.chat_service.response_pool(
+            "decree",
+            DECREE_PROMPT,
+            target=int(os.getenv("DECREE_POOL_SIZE", "20")),
+            low_water=int(os.getenv("DECREE_POOL_LOW_WATER", "5"))
+        )
+        self.decree_pool.start()
         
     async def on_ready(self):
         logger.info(f'Logged in as {self.user} (ID: {self.user.id})')
@@ -36,11 +50,18 @@ async def chat(interaction: discord.Interaction, message: str):
     try:
         logger.info(f"Received chat command from {interaction.user}")
         await interaction.response.defer()
-        response = await client.chat_service.generate_response(
+        throttle = EditThrottle(STREAM_EDIT_INTERVAL)
+        text = ""
+        async for delta in client.chat_service.stream_response(
             user_id=str(interaction.user.id),
             message=message
-        )
-        await interaction.followup.send(response["response"])
+        ):
+            text += delta
+            # discord.py waits out 429s itself; the throttle keeps us from hitting them
+            if throttle.due():
+                await interaction.edit_original_response(content=text[:2000])
+                throttle.mark()
+        await interaction.edit_original_response(content=text[:2000] or "Meow? Something went wrong!")
         logger.info("Successfully sent chat response")
     except Exception as e:
         logger.error(f"Error in chat command: {str(e)}")
@@ -50,10 +71,15 @@ async def chat(interaction: discord.Interaction, message: str):
 async def decree(interaction: discord.Interaction):
     try:
         logger.info(f"Received decree command from {interaction.user}")
+        decree = client.decree_pool.pop()
+        if decree is not None:
+            await interaction.response.send_message(decree)
+            logger.info("Sent pooled decree")
+            return
         await interaction.response.defer()
         response = await client.chat_service.generate_response(
             user_id=str(interaction.user.id),
-            message="Issue a royal decree!"
+            message=DECREE_PROMPT
         )
         await interaction.followup.send(response["response"])
         logger.info("Successfully sent decree")
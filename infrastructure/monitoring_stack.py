@@ -51,6 +51,40 @@ class MonitoringStack(Stack):
                         dimensions={"Platform": platform}
                     ) for platform in ["discord", "web", "instagram"]
                 ]
+            ),
+
+            cloudwatch.GraphWidget(
+                title="Prompt Tokens per Chat",
+                left=[
+                    cloudwatch.Metric(
+                        namespace="CremeBruleeChatbot",
+                        metric_name="ChatPromptTokens",
+                        statistic="p95",
+                        period=300
+                    )
+                ]
+            ),
+
+            cloudwatch.GraphWidget(
+                title="OpenAI Backend Guard",
+                left=[
+                    cloudwatch.Metric(
+                        namespace="CremeBruleeChatbot",
+                        metric_name=name,
+                        statistic="avg",
+                        period=60,
+                        dimensions={"Backend": "openai"}
+                    ) for name in ["ConcurrencyLimit", "BackendInFlight"]
+                ],
+                right=[
+                    cloudwatch.Metric(
+                        namespace="CremeBruleeChatbot",
+                        metric_name="CircuitState",
+                        statistic="max",
+                        period=60,
+                        dimensions={"Backend": "openai"}
+                    )
+                ]
             )
         )
 
@@ -66,4 +100,18 @@ class MonitoringStack(Stack):
             threshold=1000,  # 1 second
             evaluation_periods=2,
             comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD
-        ) 
\ No newline at end of file
+        )
+
+        cloudwatch.Alarm(
+            self, "CircuitOpenAlarm",
+            metric=cloudwatch.Metric(
+                namespace="CremeBruleeChatbot",
+                metric_name="CircuitState",
+                statistic="max",
+                period=60,
+                dimensions={"Backend": "openai"}
+            ),
+            threshold=2,  # open
+            evaluation_periods=3,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD
+        )
@@ -2,168 +2,433 @@ import json
 import logging
 import os
 import base64
-import random
-import urllib.request
-import urllib.error
-import boto3
+import time
 from typing import Any, Dict
 
-try:
-    from nacl.signing import VerifyKey
-    from nacl.exceptions import BadSignatureError
-    NACL_AVAILABLE = True
-except Exception:  # pragma: no cover
-    NACL_AVAILABLE = False
+from services.client_registry import registry
+from services.edit_throttle import EditThrottle
+from services.command_router import GENERATED, CommandRouter, message_envelope
+from services.idempotency_service import IdempotencyService
+from services.request_log import RequestLog, annotate
+from services.signature_service import SignatureService
+from services.write_behind import drain_write_behind
+
+# Heavy dependencies (boto3, openai, urllib.request) are imported on the code
+# path that needs them, so PING and /decree cold starts never load them.
+# `python scripts/import_report.py` summarizes what a cold start imports.
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# One JSON line per request; successes are sampled, failures always logged
+request_log = RequestLog(logger, sample_rate=float(os.environ.get("LOG_SAMPLE_RATE", "1.0")))
+
 DISCORD_PUBLIC_KEY = os.environ.get("DISCORD_PUBLIC_KEY", "")
+# Replay window for X-Signature-Timestamp, in seconds (0 disables the check)
+SIGNATURE_MAX_AGE = int(os.environ.get("DISCORD_SIGNATURE_MAX_AGE", "300"))
+DISCORD_API_BASE = os.environ.get("DISCORD_API_BASE", "https://discord.com/api/v10")
+
+# "deferred" acknowledges /chat with type 5 and posts the reply from an async
+# self-invocation; "sync" generates the reply inline (subject to Discord's 3s deadline).
+CHAT_RESPONSE_MODE = os.environ.get("CHAT_RESPONSE_MODE", "deferred").lower()
+
+# Stream follow-up replies into the deferred message, editing it at most
+# once per STREAM_EDIT_INTERVAL seconds until the final text arrives.
+CHAT_STREAMING = os.environ.get("CHAT_STREAMING", "true").lower() == "true"
+STREAM_EDIT_INTERVAL = float(os.environ.get("STREAM_EDIT_INTERVAL", "1.0"))
+
+# Top-level key marking an internal follow-up event. API Gateway events keep the
+# client payload under "body", so this key can only come from our own invoke.
+FOLLOWUP_EVENT_KEY = "cremeai_followup"
+
+# Discord may deliver the same interaction more than once; generated commands
+# are deduplicated by interaction id for this many seconds.
+INTERACTION_DEDUPE_TTL = int(os.environ.get("INTERACTION_DEDUPE_TTL", "120"))
+# How long a duplicate waits for the original delivery's response
+INTERACTION_JOIN_TIMEOUT = float(os.environ.get("INTERACTION_JOIN_TIMEOUT", "2.0"))
+# Socket/connect timeout for the dedupe Redis; a slow Redis must not eat the deadline
+REDIS_DEDUPE_TIMEOUT = float(os.environ.get("REDIS_DEDUPE_TIMEOUT", "0.25"))
+
+# Seconds a reply may take before a canned in-character line is used instead.
+# Inline replies must beat Discord's 3s window; follow-ups have the 15 minute
+# interaction token but the bot function times out at 29s.
+INLINE_CHAT_DEADLINE = float(os.environ.get("INLINE_CHAT_DEADLINE", "2.5"))
+FOLLOWUP_CHAT_DEADLINE = float(os.environ.get("FOLLOWUP_CHAT_DEADLINE", "20"))
+
+PONG_BODY = json.dumps({'type': 1})
+
+# Invocations served by this container; the first one is the cold start
+_invocation_count = 0
+
+def _get_signature_service() -> SignatureService:
+    """Verifier with the parsed public key, built once per container"""
+    return registry.get(
+        "signature",
+        lambda: SignatureService(DISCORD_PUBLIC_KEY, max_age=SIGNATURE_MAX_AGE),
+        (DISCORD_PUBLIC_KEY, SIGNATURE_MAX_AGE)
+    )
 
 def verify_signature(event, body_bytes: bytes) -> bool:
     """Verify Discord signature using Ed25519.
 
     - Uses `X-Signature-Ed25519` and `X-Signature-Timestamp` headers.
     - Message to verify is timestamp + raw body bytes.
+    - Timestamps outside the SIGNATURE_MAX_AGE replay window are rejected.
     - If PyNaCl isn't available, log a warning and allow (to avoid blocking URL verification),
       but this should be enabled for production.
     """
     try:
-        headers_in = event.get("headers") or {}
-        headers = {str(k).lower(): v for k, v in headers_in.items()}
-        signature = headers.get("x-signature-ed25519")
-        timestamp = headers.get("x-signature-timestamp")
-
-        if not signature or not timestamp:
-            logger.warning("Missing Discord signature headers: sig=%s, ts_present=%s", bool(signature), bool(timestamp))
-            return False
-
-        if not DISCORD_PUBLIC_KEY:
-            logger.warning("DISCORD_PUBLIC_KEY env var not set; skipping signature verification")
-            return True
-
-        if not NACL_AVAILABLE:
-            logger.warning("PyNaCl not available; skipping signature verification (enable in production)")
-            return True
-
-        logger.info(
-            "Verifying Discord signature: headers=%s, body_len=%d, ts_len=%d, sig_len=%d",
-            list(headers.keys())[:8], len(body_bytes), len(timestamp or ""), len(signature or "")
-        )
-
-        verify_key = VerifyKey(bytes.fromhex(DISCORD_PUBLIC_KEY))
-        verify_key.verify(timestamp.encode() + body_bytes, bytes.fromhex(signature))
-        return True
-    except BadSignatureError:
-        logger.warning("Invalid Discord request signature (BadSignatureError)")
-        return False
+        headers = event.get("headers") or {}
+        return _get_signature_service().verify(headers, body_bytes)
     except Exception as e:
         logger.error(f"Verification error: {str(e)}")
         return False
 
-def handle_command(body):
-    """Handle Discord command"""
-    try:
-        command = body.get('data', {}).get('name', '')
-
-        if command == 'chat':
-            # Extract message option and reply synchronously
-            opts = body.get('data', {}).get('options', []) or []
-            msg = ''
-            if isinstance(opts, list) and len(opts) > 0:
-                msg = str(opts[0].get('value', ''))
-            try:
-                reply = _generate_chat_reply(msg)
-                return {
-                    'type': 4,  # CHANNEL_MESSAGE_WITH_SOURCE
-                    'data': {
-                        'content': reply
-                    }
-                }
-            except Exception as e:
-                logger.error(f"Error generating chat response: {str(e)}")
-                return {
-                    'type': 4,
-                    'data': {
-                        'content': "Meow? Something went wrong with the chat!"
-                    }
-                }
-        elif command == 'decree':
-            # Randomized cat facts; avoid repeating the same fact back-to-back
-            facts = [
-                "Brûlée is Turkish.",
-                "Brûlée does not like baths.",
-                "Brûlée only likes japanese cat food.",
-                "Brûlée is smart, beautiful, kind and likes daily affirmations.",
-                "Brûlée is 7 pounds and doesn’t bite."
-            ]
-
-            # Keep simple memory within warm Lambda container to prevent immediate repeats
-            global _last_fact_idx
-            try:
-                last_idx = _last_fact_idx  # may not exist yet
-            except NameError:
-                last_idx = None
-
-            if len(facts) == 1:
-                idx = 0
-            else:
-                # Pick a new index different from last_idx
-                idx = random.randrange(len(facts))
-                if last_idx is not None and len(facts) > 1:
-                    # up to two tries to avoid repetition; sufficient for small lists
-                    if idx == last_idx:
-                        idx = (idx + 1) % len(facts)
-
-            _last_fact_idx = idx
-            response = f"Cat Fact about Crème Brûlée: {facts[idx]}"
-        else:
-            response = "Meow? I don't understand that command!"
-        
-        return {
-            'type': 4,  # CHANNEL_MESSAGE_WITH_SOURCE
-            'data': {
-                'content': response
-            }
-        }
-    except Exception as e:
-        logger.error(f"Command error: {str(e)}")
+# Slash commands. Static and cached envelopes are serialized once at import.
+router = CommandRouter(
+    unknown_content="Meow? I don't understand that command!",
+    error_content="Meow? Something went wrong!"
+)
+
+DECREE_FACTS = [
+    "Brûlée is Turkish.",
+    "Brûlée does not like baths.",
+    "Brûlée only likes japanese cat food.",
+    "Brûlée is smart, beautiful, kind and likes daily affirmations.",
+    "Brûlée is 7 pounds and doesn’t bite."
+]
+
+# Shuffle-bag draw: no fact repeats until every fact has been served
+router.cached('decree', [f"Cat Fact about Crème Brûlée: {fact}" for fact in DECREE_FACTS])
+
+@router.generated('chat', error_content="Meow? Something went wrong with the chat!")
+def _chat_command(body) -> Dict[str, Any]:
+    opts = body.get('data', {}).get('options', []) or []
+    msg = ''
+    if isinstance(opts, list) and len(opts) > 0:
+        msg = str(opts[0].get('value', ''))
+    if CHAT_RESPONSE_MODE == 'deferred' and _dispatch_followup(body, msg):
         return {
-            'type': 4,
-            'data': {
-                'content': "Meow? Something went wrong!"
-            }
+            'type': 5  # DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE
         }
+    return message_envelope(_generate_chat_reply(msg, INLINE_CHAT_DEADLINE))
+
+# Answer for a duplicate whose original is still generating past the join timeout
+IN_PROGRESS_BODY = json.dumps(message_envelope("Meow... still thinking about that one."))
+
+def _get_idempotency_service() -> IdempotencyService:
+    """Interaction dedupe store: container memory first, Redis across containers"""
+    def build():
+        try:
+            redis_client = _get_redis_client()
+        except Exception as e:
+            # Bad config or a missing redis package must not fail every command
+            logger.error("Redis unavailable for interaction dedupe, using memory only: %s", str(e))
+            redis_client = None
+        return IdempotencyService(redis_client, ttl=INTERACTION_DEDUPE_TTL)
+    return registry.get(
+        "idempotency",
+        build,
+        (INTERACTION_DEDUPE_TTL, os.environ.get("REDIS_HOST"), os.environ.get("REDIS_PORT"))
+    )
+
+def dispatch_command(body) -> str:
+    """Serialized command response, replayed for duplicate interaction ids.
+
+    Static and cached commands are cheap and side-effect free, so only
+    generated ones (model calls, follow-up dispatch) go through the dedupe store.
+    Only successful responses are stored; a failed command releases its claim.
+    """
+    interaction_id = body.get('id')
+    if not interaction_id or router.kind(body) != GENERATED:
+        return router.dispatch(body)
+
+    dedupe = _get_idempotency_service()
+    owner, stored = dedupe.claim(interaction_id, wait=INTERACTION_JOIN_TIMEOUT)
+    if not owner:
+        annotate(duplicate=True, joined=stored is not None)
+        return stored if stored is not None else IN_PROGRESS_BODY
 
-def _generate_chat_reply(message: str) -> str:
-    """Generate a reply. Tries ChatService; falls back to echo if unavailable/slow."""
     try:
+        response, ok = router.dispatch_result(body)
+    except Exception:
+        dedupe.release(interaction_id)
+        raise
+    if ok:
+        dedupe.complete(interaction_id, response)
+    else:
+        # A retry after a transient failure should run again, not replay the error
+        dedupe.release(interaction_id)
+    return response
+
+def handle_command(body) -> Dict[str, Any]:
+    """Handle Discord command (decoded form of `router.dispatch`)"""
+    return json.loads(router.dispatch(body))
+
+def _chat_service_fingerprint():
+    """Config the cached ChatService depends on; a change forces a rebuild"""
+    return (os.environ.get("OPENAI_API_KEY"), os.environ.get("OPENAI_BASE_URL"))
+
+def _get_chat_service():
+    """ChatService (and its pooled async OpenAI client) shared across warm invocations"""
+    def build():
         from services.chat_service import ChatService
-        svc = ChatService()
-        result = svc.generate_response(user_id="discord", message=message)
+        return ChatService()
+    return registry.get("chat_service", build, _chat_service_fingerprint())
+
+def _generate_chat_reply(message: str, deadline: float = None) -> str:
+    """Generate a reply. Tries ChatService; falls back to echo if unavailable.
+
+    Past `deadline` seconds ChatService answers with a canned line instead.
+    """
+    try:
+        svc = _get_chat_service()
+        start = time.perf_counter()
+        result = svc.generate_response_sync(user_id="discord", message=message, deadline=deadline)
+        annotate(
+            chat_client="reused" if registry.last_reused("chat_service") else "built",
+            circuit_state=svc.backend.breaker.state,
+            gen_ms=round((time.perf_counter() - start) * 1000, 2)
+        )
         return result.get("response") or f"Meow! You said: {message}"
     except Exception as e:
         logger.warning("ChatService unavailable, falling back. err=%s", str(e))
+        annotate(chat_fallback=True)
         return f"Meow! You said: {message}"
 
+def _get_lambda_client():
+    """Lambda client used for self-invocation (reused while warm)"""
+    def build():
+        import boto3
+        return boto3.client("lambda")
+    return registry.get("lambda", build, os.environ.get("AWS_REGION"))
+
+def _dispatch_followup(body, message: str) -> bool:
+    """Hand /chat generation to an asynchronous invocation of this function.
+
+    Returns False when the follow-up cannot be scheduled so the caller can
+    fall back to replying synchronously.
+    """
+    function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+    application_id = body.get('application_id')
+    token = body.get('token')
+    if not function_name or not application_id or not token:
+        logger.warning(
+            "Deferred mode unavailable: function=%s, app_id=%s, token=%s",
+            bool(function_name), bool(application_id), bool(token)
+        )
+        return False
+
+    payload = {
+        FOLLOWUP_EVENT_KEY: {
+            'application_id': application_id,
+            'token': token,
+            'message': message
+        }
+    }
+    try:
+        _get_lambda_client().invoke(
+            FunctionName=function_name,
+            InvocationType='Event',
+            Payload=json.dumps(payload).encode('utf-8')
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Failed to dispatch follow-up: {str(e)}")
+        return False
+
+def _edit_original_response(application_id: str, token: str, content: str) -> None:
+    """PATCH the deferred interaction's original message via the webhook API"""
+    import urllib.request
+    url = f"{DISCORD_API_BASE}/webhooks/{application_id}/{token}/messages/@original"
+    request = urllib.request.Request(
+        url,
+        data=json.dumps({'content': content[:2000]}).encode('utf-8'),
+        method='PATCH',
+        headers={
+            'Content-Type': 'application/json',
+            # Discord rejects the default urllib agent
+            'User-Agent': 'DiscordBot (https://github.com/CoffeeCat0214/CremeAI, 1.0)'
+        }
+    )
+    with urllib.request.urlopen(request, timeout=10) as resp:
+        resp.read()
+
+def _retry_after(error) -> float:
+    """Seconds to wait from a Discord 429, or None if it can't be read"""
+    try:
+        return float(json.loads(error.read() or b"{}").get('retry_after'))
+    except Exception:
+        pass
+    try:
+        return float(error.headers.get('Retry-After'))
+    except Exception:
+        return None
+
+def _stream_chat_reply(application_id: str, token: str, message: str) -> str:
+    """Stream the reply into the deferred message and return the full text.
+
+    Intermediate edits are throttled and best-effort; the caller always sends
+    the final edit. Falls back to a blocking generation if the stream fails
+    before producing anything.
+    """
+    import urllib.error
+    throttle = EditThrottle(STREAM_EDIT_INTERVAL)
+    parts = []
+    start = time.perf_counter()
+    try:
+        for delta in _get_chat_service().stream_response_sync(
+            user_id="discord", message=message, deadline=FOLLOWUP_CHAT_DEADLINE
+        ):
+            if not parts:
+                annotate(first_token_ms=round((time.perf_counter() - start) * 1000, 2))
+            parts.append(delta)
+            if throttle.due():
+                try:
+                    _edit_original_response(application_id, token, "".join(parts))
+                    throttle.mark()
+                except urllib.error.HTTPError as e:
+                    if e.code != 429:
+                        raise
+                    throttle.backoff(_retry_after(e))
+    except Exception as e:
+        logger.warning("Streaming reply failed after %d chunks: %s", len(parts), str(e))
+        if not parts:
+            return _generate_chat_reply(message, FOLLOWUP_CHAT_DEADLINE)
+    finally:
+        annotate(stream_edits=throttle.edits, stream_rate_limited=throttle.rate_limited)
+    return "".join(parts) or "Meow? Something went wrong with the chat!"
+
+def handle_followup(followup) -> Dict[str, Any]:
+    """Generate the /chat reply and deliver it to the deferred interaction.
+
+    Never raises: a failed async invocation would be retried by Lambda and
+    post the reply twice.
+    """
+    import urllib.error
+    application_id = followup.get('application_id')
+    token = followup.get('token')
+    message = followup.get('message', '')
+    try:
+        if CHAT_STREAMING:
+            reply = _stream_chat_reply(application_id, token, message)
+        else:
+            reply = _generate_chat_reply(message, FOLLOWUP_CHAT_DEADLINE)
+    except Exception as e:
+        logger.error(f"Error generating chat response: {str(e)}")
+        reply = "Meow? Something went wrong with the chat!"
+
+    for attempt in range(2):
+        try:
+            _edit_original_response(application_id, token, reply)
+            return {'statusCode': 200}
+        except urllib.error.HTTPError as e:
+            if e.code == 429 and attempt == 0:
+                # The final text must land; wait out the rate limit once
+                time.sleep(min(_retry_after(e) or 1.0, 5.0))
+                continue
+            logger.error(f"Follow-up rejected by Discord: status={e.code}")
+            annotate(discord_status=e.code)
+            break
+        except Exception as e:
+            logger.error(f"Follow-up delivery failed: {str(e)}")
+            break
+    return {'statusCode': 502}
+
+def _get_redis_client():
+    """Redis client shared across warm invocations, or None when not configured"""
+    host = os.environ.get("REDIS_HOST")
+    if not host:
+        return None
+    port = int(os.environ.get("REDIS_PORT", 6379))
+    def build():
+        import redis
+        from redis.backoff import NoBackoff
+        from redis.retry import Retry
+        # Dedupe sits on the 3s interaction deadline: one attempt, sub-second timeouts
+        return redis.Redis(
+            host=host,
+            port=port,
+            decode_responses=True,
+            socket_timeout=REDIS_DEDUPE_TIMEOUT,
+            socket_connect_timeout=REDIS_DEDUPE_TIMEOUT,
+            retry=Retry(NoBackoff(), 0),
+            retry_on_timeout=False
+        )
+    return registry.get("redis", build, (host, port))
+
+def is_warmup_event(event) -> bool:
+    """Recognize scheduled keep-warm pings.
+
+    Accepts our own `{"warmup": true}` schedule input, the serverless warmup
+    plugin's payload and bare EventBridge scheduled events.
+    """
+    if not isinstance(event, dict):
+        return False
+    if event.get("warmup") is True:
+        return True
+    source = event.get("source")
+    return source == "serverless-plugin-warmup" or (
+        source == "aws.events" and event.get("detail-type") == "Scheduled Event"
+    )
+
+def warm_up() -> Dict[str, Any]:
+    """Eagerly build every client the request path would otherwise build lazily"""
+    initializers = {
+        "signature": _get_signature_service,
+        "chat_service": _get_chat_service,
+        "lambda": _get_lambda_client,
+        "redis": _get_redis_client,
+        "idempotency": _get_idempotency_service,
+    }
+    initialized, failed = [], []
+    for name, initializer in initializers.items():
+        try:
+            if initializer() is not None:
+                initialized.append(name)
+        except Exception as e:
+            logger.warning("Warm-up failed for %s: %s", name, str(e))
+            failed.append(name)
+    return {'warmup': True, 'initialized': initialized, 'failed': failed}
+
 def lambda_handler(event, context):
     """AWS Lambda handler"""
+    global _invocation_count
+    _invocation_count += 1
+
+    record = request_log.start(
+        request_id=getattr(context, "aws_request_id", None),
+        cold_start=_invocation_count == 1
+    )
     try:
-        # Minimal event logging to avoid huge payloads in logs
+        if is_warmup_event(event):
+            record.set(kind="warmup")
+            result = warm_up()
+            result['cold_start'] = _invocation_count == 1
+            # Cumulative per-command counters for this container, logged on every ping
+            record.set(initialized=result['initialized'], failed=result['failed'], commands=router.stats())
+            return result
+
+        if isinstance(event, dict) and FOLLOWUP_EVENT_KEY in event:
+            record.set(kind="followup")
+            response = handle_followup(event[FOLLOWUP_EVENT_KEY] or {})
+        else:
+            record.set(kind="interaction")
+            response = handle_interaction(event, record)
+        record.set(status=response.get('statusCode'))
+        return response
+    finally:
+        # The container may be frozen right after returning; don't leave buffered writes behind
         try:
-            logger.info(
-                "Event meta: keys=%s, isB64=%s, header_keys=%s",
-                list((event or {}).keys()),
-                (event or {}).get("isBase64Encoded"),
-                list(((event or {}).get("headers") or {}).keys())[:8]
-            )
-        except Exception:
-            pass
-        
-        # (No internal follow-up handling in synchronous mode)
-        
-        
+            drain_write_behind()
+        except Exception as e:
+            logger.error("Write-behind drain failed: %s", str(e))
+        record.emit()
+
+def handle_interaction(event, record) -> Dict[str, Any]:
+    """Verify and answer an API Gateway-delivered Discord interaction"""
+    try:
         # Prepare raw body bytes for signature verification
         raw_body = event.get("body", "")
         if event.get("isBase64Encoded") is True:
@@ -174,44 +439,57 @@ def lambda_handler(event, context):
             body_bytes = body_str.encode("utf-8")
 
         body = json.loads(body_str or "{}")
-
+        record.set(
+            interaction_type=body.get('type'),
+            interaction_id=body.get('id'),
+            command=(body.get('data') or {}).get('name')
+        )
+        record.mark("parse_ms")
 
         # Verify signature for all requests (including PING)
-        if not verify_signature(event, body_bytes):
+        verified = verify_signature(event, body_bytes)
+        record.mark("verify_ms")
+        if not verified:
             return {
                 'statusCode': 401,
                 'headers': {'Content-Type': 'application/json'},
                 'body': json.dumps({'error': 'invalid request signature'})
             }
-        
+
         # Handle Discord PING after verification
         if body.get('type') == 1:
             return {
                 'statusCode': 200,
                 'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'type': 1})
+                'body': PONG_BODY
             }
 
         # Other types
         # Handle commands
         if body.get('type') == 2:  # APPLICATION_COMMAND
-            response = handle_command(body)
+            response_body = dispatch_command(body)
+            record.mark("dispatch_ms")
             return {
                 'statusCode': 200,
                 'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps(response)
+                'body': response_body
             }
 
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'type': 1})
+            'body': PONG_BODY
         }
 
     except Exception as e:
-        logger.error(f"Error: {str(e)}")
+        record.error(e)
         return {
             'statusCode': 500,
             'headers': {'Content-Type': 'application/json'},
             'body': json.dumps({'error': str(e)})
         }
+
+# Provisioned-concurrency environments are initialized before any traffic
+# arrives, so pay for client construction there instead of on the first request.
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "provisioned-concurrency":
+    warm_up()
@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 import time
@@ -11,6 +13,8 @@ from services.chat_service import ChatService
 from services.memory_service import MemoryService
 from services.personality_service import PersonalityService
 from services.monitoring_service import MonitoringService
+from services.redis_pool import close_redis
+from services.write_behind import drain_write_behind
 from middleware.rate_limiter import RateLimiter
 from middleware.validation import RequestValidationMiddleware
 from exceptions import ChatbotException, AIServiceError, InvalidCredentials
@@ -19,16 +23,44 @@ from services.webhook_service import WebhookService, WebhookConfig
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Seconds between BackendGuard snapshots sent to CloudWatch
+BACKEND_METRICS_INTERVAL = float(os.getenv("BACKEND_METRICS_INTERVAL", 60))
+
 app = FastAPI(title="Crème Brûlée Chatbot API")
 
 # Initialize services
 auth_service = AuthService()
 monitoring_service = MonitoringService()
+# One ChatService per worker; its AsyncOpenAI client shares the pooled connections
+chat_service = ChatService()
 rate_limiter = RateLimiter()
 
 # Initialize webhook service
 webhook_service = WebhookService()
 
+async def export_backend_metrics():
+    """Periodically publish circuit state and concurrency limit, off the request path"""
+    while True:
+        await asyncio.sleep(BACKEND_METRICS_INTERVAL)
+        try:
+            await monitoring_service.log_backend_metrics("openai", chat_service.backend.snapshot())
+        except Exception as e:
+            logger.warning("Backend metrics export failed: %s", str(e))
+
+@app.on_event("startup")
+async def start_backend_metrics():
+    app.state.backend_metrics = asyncio.create_task(export_backend_metrics())
+
+@app.on_event("shutdown")
+async def close_connection_pools():
+    task = getattr(app.state, "backend_metrics", None)
+    if task is not None:
+        task.cancel()
+    await asyncio.to_thread(drain_write_behind)
+    await close_redis()
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -87,7 +119,6 @@ async def chat_endpoint(
     
     start_time = time.time()
     try:
-        chat_service = ChatService()
         response = await chat_service.generate_response(
             user_id=auth['user_id'],
             message=message.message,
@@ -99,7 +130,8 @@ async def chat_endpoint(
             user_id=auth['user_id'],
             platform=message.platform,
             response_length=len(response["response"]),
-            processing_time=process_time
+            processing_time=process_time,
+            prompt_tokens=response.get("prompt_tokens")
         )
         
         return ChatResponse(**response)
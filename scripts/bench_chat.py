@@ -0,0 +1,96 @@
+"""Closed-loop load test for ChatService.
+
+Point it at the fake server (scripts/fake_openai_server.py) to measure
+throughput and latency features offline:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake \\
+        python scripts/bench_chat.py --concurrency 50 --requests 1000 --stream
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.chat_service import ChatService
+
+MESSAGES = [
+    "hi",
+    "do you like pigeons",
+    "what's your favorite spot in the apartment?",
+    "Explain why the radiator makes that clanking noise every morning",
+    "tell me about your day",
+]
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+async def run(concurrency: int, total: int, stream: bool, deadline: float = None) -> Dict[str, float]:
+    service = ChatService()
+    latencies: List[float] = []
+    first_tokens: List[float] = []
+    counts = {"ok": 0, "fallback": 0, "errors": 0}
+    issued = iter(range(total))
+
+    async def one(i: int):
+        message = MESSAGES[i % len(MESSAGES)]
+        start = time.perf_counter()
+        try:
+            if stream:
+                first = None
+                async for _ in service.stream_response(str(i), message, deadline=deadline):
+                    if first is None:
+                        first = time.perf_counter() - start
+                first_tokens.append(first or 0.0)
+                counts["ok"] += 1
+            else:
+                result = await service.generate_response(str(i), message, deadline=deadline)
+                counts["fallback" if result.get("fallback") else "ok"] += 1
+        except Exception:
+            counts["errors"] += 1
+        latencies.append(time.perf_counter() - start)
+
+    async def worker():
+        for i in issued:
+            await one(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 2),
+        **counts,
+        **{f"p{p}_ms": round(percentile(latencies, p) * 1000, 1) for p in (50, 95, 99)},
+        "backend": service.backend.snapshot(),
+        "hedger": service.hedger.stats,
+        "routes": service.router.stats
+    }
+    if stream:
+        report.update({f"ttft_p{p}_ms": round(percentile(first_tokens, p) * 1000, 1) for p in (50, 95)})
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--stream", action="store_true", help="use stream_response instead of generate_response")
+    parser.add_argument("--deadline", type=float, default=None, help="per-request deadline in seconds")
+    args = parser.parse_args()
+    if not os.getenv("OPENAI_BASE_URL"):
+        print("OPENAI_BASE_URL is not set; this would hit the real API.", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(asyncio.run(run(args.concurrency, args.requests, args.stream, args.deadline)), indent=2))
+
+if __name__ == "__main__":
+    main()
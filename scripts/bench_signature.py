@@ -0,0 +1,56 @@
+"""Microbenchmark for Discord signature verification.
+
+Compares the old per-request path (copy + lowercase the headers, parse the
+hex key, verify) with SignatureService, which parses the key once.
+
+    python scripts/bench_signature.py [iterations]
+"""
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nacl.signing import SigningKey, VerifyKey
+
+from services.signature_service import SignatureService
+
+def main(iterations: int = 20000):
+    signing_key = SigningKey.generate()
+    public_key = signing_key.verify_key.encode().hex()
+    body = b'{"type": 1}'
+    timestamp = str(int(time.time()))
+    signature = signing_key.sign(timestamp.encode() + body).signature.hex()
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": "Discord-Interactions/1.0 (+https://discord.com)",
+        "X-Signature-Ed25519": signature,
+        "X-Signature-Timestamp": timestamp,
+        "Host": "example.execute-api.us-east-1.amazonaws.com",
+    }
+
+    def before():
+        lowered = {str(k).lower(): v for k, v in headers.items()}
+        verify_key = VerifyKey(bytes.fromhex(public_key))
+        verify_key.verify(
+            lowered["x-signature-timestamp"].encode() + body,
+            bytes.fromhex(lowered["x-signature-ed25519"])
+        )
+
+    service = SignatureService(public_key)
+
+    def after():
+        assert service.verify(headers, body)
+
+    stale_headers = dict(headers, **{"X-Signature-Timestamp": "1000000000"})
+
+    def stale():
+        assert not service.verify(stale_headers, body)
+
+    for name, fn in (("before", before), ("after", after), ("stale reject", stale)):
+        seconds = min(timeit.repeat(fn, number=iterations, repeat=3))
+        print(f"{name:>12}: {seconds / iterations * 1e6:8.2f} us/request")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
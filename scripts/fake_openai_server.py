@@ -0,0 +1,270 @@
+"""Local OpenAI-compatible chat-completions server for load and latency tests.
+
+Serves POST /v1/chat/completions (blocking and `stream=true` SSE) and
+GET /v1/models with in-character canned replies, so ChatService, the bot and
+the Lambda handler can be benchmarked without the real API:
+
+    python scripts/fake_openai_server.py --latency lognormal:0.8,0.4 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake python scripts/bench_chat.py
+
+Latency specs: `fixed:S`, `uniform:LO,HI`, `normal:MEAN,SD`,
+`lognormal:MEDIAN,SIGMA` and `exp:MEAN`, all in seconds. For streams the
+latency is the time to first token; later tokens follow every
+`--token-interval` seconds.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+REPLIES = [
+    "Mrrp. I was napping on the radiator, but fine, I'm listening.",
+    "Pigeons on the fire escape again. Anyway, what do you want, human?",
+    "*stretches* That sounds like a you problem. Treats might help though. 😾",
+    "Sirens outside, crumbs on the couch. Another perfect NYC afternoon.",
+    "I'll allow it. Now scratch behind my ears.",
+]
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Sampler for a latency spec such as `lognormal:0.8,0.4` (seconds)"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+class TokenBucket:
+    """Requests-per-minute limit; over it the server answers 429"""
+
+    def __init__(self, rpm: float):
+        self.rate = rpm / 60
+        self.capacity = max(rpm / 60, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> Optional[float]:
+        """None if admitted, otherwise seconds until a token is available"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.rate
+
+class FakeOpenAI:
+    """Behaviour shared by all request handler threads"""
+
+    def __init__(
+        self,
+        latency: str = "fixed:0.2",
+        token_interval: float = 0.02,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        rpm: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.sample_latency = parse_latency(latency)
+        self.token_interval = token_interval
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.bucket = TokenBucket(rpm) if rpm > 0 else None
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "streams": 0}
+
+    def _count(self, name: str):
+        with self.lock:
+            self.stats[name] += 1
+
+    def draw(self) -> Dict[str, float]:
+        with self.lock:
+            return {
+                "latency": self.sample_latency(self.rng),
+                "error": self.rng.random() < self.error_rate,
+                "rate_limited": self.rng.random() < self.rate_limit_rate,
+                "reply": self.rng.randrange(len(REPLIES))
+            }
+
+    def reply_text(self, params: dict, index: int) -> str:
+        max_words = max(1, int(params.get("max_tokens") or 200) * 3 // 4)
+        words = REPLIES[index % len(REPLIES)].split(" ")
+        return " ".join(words[:max_words])
+
+def _completion_id() -> str:
+    return f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+
+def _usage(params: dict, texts: List[str]) -> Dict[str, int]:
+    prompt = sum(len(m.get("content") or "") for m in params.get("messages", [])) // 4
+    completion = sum(len(t) for t in texts) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeOpenAIServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: Dict[str, str] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, kind: str, message: str, headers: Dict[str, str] = None):
+        self._send_json(status, {"error": {"message": message, "type": kind, "code": None}}, headers)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": model, "object": "model", "owned_by": "fake"} for model in ("gpt-4o-mini", "gpt-4o")
+            ]})
+        else:
+            self._error(404, "invalid_request_error", f"Unknown path {self.path}")
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._error(400, "invalid_request_error", "Body is not JSON")
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._error(404, "invalid_request_error", f"Unknown path {self.path}")
+            return
+
+        fake._count("requests")
+        draw = fake.draw()
+        retry_after = fake.bucket.take() if fake.bucket is not None else None
+        if retry_after is not None or draw["rate_limited"]:
+            fake._count("rate_limited")
+            wait = f"{retry_after or 1.0:.2f}"
+            self._error(429, "rate_limit_error", "Rate limit reached", {"Retry-After": wait})
+            return
+
+        time.sleep(draw["latency"])
+        if draw["error"]:
+            fake._count("errors")
+            self._error(500, "server_error", "Injected failure")
+            return
+
+        n = int(params.get("n") or 1)
+        texts = [fake.reply_text(params, draw["reply"] + i) for i in range(n)]
+        if params.get("stream"):
+            fake._count("streams")
+            self._stream(params, texts)
+        else:
+            self._send_json(200, {
+                "id": _completion_id(),
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": params.get("model", "gpt-4o-mini"),
+                "choices": [
+                    {"index": i, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+                    for i, text in enumerate(texts)
+                ],
+                "usage": _usage(params, texts)
+            })
+
+    def _stream(self, params: dict, texts: List[str]):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        completion_id, created = _completion_id(), int(time.time())
+
+        def event(index: int, delta: dict, finish: str = None, usage: dict = None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": params.get("model", "gpt-4o-mini"),
+                "choices": [] if usage else [{"index": index, "delta": delta, "finish_reason": finish}]
+            }
+            if usage:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            for index, text in enumerate(texts):
+                event(index, {"role": "assistant", "content": ""})
+                words = text.split(" ")
+                for i, word in enumerate(words):
+                    event(index, {"content": word if i == 0 else " " + word})
+                    time.sleep(self.server.fake.token_interval)
+                event(index, {}, "stop")
+            if (params.get("stream_options") or {}).get("include_usage"):
+                event(0, {}, usage=_usage(params, texts))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream (e.g. a hedge loser)
+            pass
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fake: FakeOpenAI):
+        super().__init__(address, FakeOpenAIHandler)
+        self.fake = fake
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+def serve_in_background(fake: FakeOpenAI, host: str = "127.0.0.1", port: int = 0) -> FakeOpenAIServer:
+    """Start a server on a daemon thread; call `.shutdown()` when done"""
+    server = FakeOpenAIServer((host, port), fake)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed:0.2", help="latency (or time to first token) distribution")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--rpm", type=float, default=0.0, help="requests per minute before 429s (0: unlimited)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(args.latency, args.token_interval, args.error_rate, args.rate_limit_rate, args.rpm, args.seed)
+    server = FakeOpenAIServer((args.host, args.port), fake)
+    print(f"Fake OpenAI listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(fake.stats))
+
+if __name__ == "__main__":
+    main()
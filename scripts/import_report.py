@@ -0,0 +1,80 @@
+"""Cold-start import-time report, summarized per top-level package.
+
+Runs a snippet in a fresh interpreter under `-X importtime` and folds the
+per-module self times into one line per top-level package (`boto3`,
+`openai`, `nacl`, ...), which is what actually moves Lambda cold starts.
+
+    python scripts/import_report.py                  # import lambda_function
+    python scripts/import_report.py --ping           # import + handle a PING
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Handles a PING the way a cold container would; verification is skipped
+# without DISCORD_PUBLIC_KEY so no signed fixture is needed.
+PING_SNIPPET = (
+    "import json, lambda_function; "
+    "lambda_function.lambda_handler({'headers': {'X-Signature-Ed25519': 'x', "
+    "'X-Signature-Timestamp': '0'}, 'body': json.dumps({'type': 1})}, None)"
+)
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Parse `-X importtime` output into (module, self_us, cumulative_us)"""
+    rows = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            rows.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return rows
+
+def summarize(rows: List[Tuple[str, int, int]]) -> Dict[str, float]:
+    """Total self time in milliseconds per top-level package"""
+    totals: Dict[str, float] = defaultdict(float)
+    for module, self_us, _ in rows:
+        totals[module.split(".")[0]] += self_us / 1000
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+def import_time_report(snippet: str = "import lambda_function", env: Dict[str, str] = None) -> Dict[str, float]:
+    """Run `snippet` in a cold interpreter and return per-package import ms"""
+    run_env = dict(os.environ)
+    run_env.pop("DISCORD_PUBLIC_KEY", None)
+    run_env.update(env or {})
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", snippet],
+        cwd=REPO_ROOT,
+        env=run_env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return summarize(parse_importtime(proc.stderr))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ping", action="store_true", help="also handle a PING after importing")
+    parser.add_argument("--top", type=int, default=15, help="packages to show")
+    parser.add_argument("--json", action="store_true", help="print the full summary as JSON")
+    args = parser.parse_args()
+
+    report = import_time_report(PING_SNIPPET if args.ping else "import lambda_function")
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'package':<28}{'ms':>10}")
+    for package, ms in list(report.items())[:args.top]:
+        print(f"{package:<28}{ms:>10.2f}")
+    print(f"{'total':<28}{sum(report.values()):>10.2f}")
+
+if __name__ == "__main__":
+    main()
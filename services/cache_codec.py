@@ -0,0 +1,82 @@
+import json
+import logging
+import os
+import zlib
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# First byte of every stored value. Readers accept all of them (plus legacy
+# JSON text, which starts with "{"), so the writer's codec can be switched
+# with entries of the old format still live.
+JSON = 1
+JSON_ZLIB = 2
+MSGPACK = 3
+MSGPACK_ZLIB = 4
+
+_COMPRESSED = {JSON: JSON_ZLIB, MSGPACK: MSGPACK_ZLIB}
+
+class CacheCodec:
+    """Versioned binary encoding for cached payloads.
+
+    Values are msgpack (JSON when msgpack isn't installed), zlib-compressed
+    when larger than `compress_threshold` bytes and compression actually
+    helps, behind a one-byte format tag.
+    """
+
+    def __init__(self, codec: Optional[str] = None, compress_threshold: int = 1024, level: int = 6):
+        if codec is None:
+            codec = "msgpack" if MSGPACK_AVAILABLE else "json"
+        if codec == "msgpack" and not MSGPACK_AVAILABLE:
+            logger.warning("msgpack not installed; caching as JSON")
+            codec = "json"
+        self.format = MSGPACK if codec == "msgpack" else JSON
+        self.compress_threshold = compress_threshold
+        self.level = level
+        self.stats: Dict[str, int] = {"encoded_bytes": 0, "compressed": 0}
+
+    def encode(self, value: Any) -> bytes:
+        fmt = self.format
+        if fmt == MSGPACK:
+            payload = msgpack.packb(value, use_bin_type=True)
+        else:
+            payload = json.dumps(value, separators=(",", ":")).encode()
+        if len(payload) > self.compress_threshold:
+            packed = zlib.compress(payload, self.level)
+            if len(packed) < len(payload):
+                fmt, payload = _COMPRESSED[fmt], packed
+                self.stats["compressed"] += 1
+        self.stats["encoded_bytes"] += len(payload) + 1
+        return bytes((fmt,)) + payload
+
+    @staticmethod
+    def decode(data: bytes) -> Any:
+        if isinstance(data, str):
+            data = data.encode()
+        fmt, payload = data[0], data[1:]
+        if fmt in (JSON_ZLIB, MSGPACK_ZLIB):
+            try:
+                payload = zlib.decompress(payload)
+            except zlib.error as e:
+                raise ValueError(f"corrupt compressed cache entry: {e}")
+        if fmt in (JSON, JSON_ZLIB):
+            return json.loads(payload)
+        if fmt in (MSGPACK, MSGPACK_ZLIB):
+            if not MSGPACK_AVAILABLE:
+                raise ValueError("msgpack-encoded cache entry but msgpack is not installed")
+            return msgpack.unpackb(payload, raw=False)
+        # Untagged JSON text written before the codec layer
+        return json.loads(data)
+
+def codec_from_env() -> CacheCodec:
+    """CacheCodec configured by CACHE_CODEC (msgpack/json) and CACHE_COMPRESS_THRESHOLD"""
+    return CacheCodec(
+        codec=os.getenv("CACHE_CODEC") or None,
+        compress_threshold=int(os.getenv("CACHE_COMPRESS_THRESHOLD", 1024))
+    )
@@ -1,53 +1,318 @@
-import redis
+import asyncio
 import json
 import hashlib
-from typing import Any, Optional
-from ..config import get_settings
+import logging
+import math
+import os
+import random
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from .cache_codec import codec_from_env
+from .local_cache import MISSING, LocalCache
+from .redis_pool import get_redis, release_lock
 
-settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Pub/sub channel telling other processes to drop L1 entries
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Keys deleted per round-trip when invalidating a tag
+INVALIDATION_BATCH = 500
+
+def tag_key(tag: str) -> str:
+    """Redis set holding the cache keys registered under `tag`"""
+    return f"tag:{tag}"
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
 
 class CacheService:
-    def __init__(self):
-        self.redis_client = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            decode_responses=True
-        )
+    def __init__(self, redis_client=None):
+        # Shared non-blocking pool unless a client is injected
+        self.redis_client = redis_client or get_redis()
         self.default_ttl = 3600  # 1 hour
+        # Bump to invalidate everything cached under the previous persona prompt
+        self.persona_version = os.getenv("PERSONA_VERSION", "1")
+        self.instance_id = uuid.uuid4().hex
+        # Versioned msgpack/JSON (+zlib) encoding of stored entries
+        self.codec = codec_from_env()
+        # Keys outlive their soft expiry by this long so stale reads can be served
+        self.stale_ttl = int(os.getenv("CACHE_STALE_TTL", 300))
+        # XFetch: beta > 1 refreshes earlier; delta is the assumed recompute time
+        self.xfetch_beta = float(os.getenv("CACHE_XFETCH_BETA", 1.0))
+        self.default_delta = 1.0
+        self.refresh_lock_ttl = 30
+        self.rng = random.random
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+        self.refresh_stats = {"stale_served": 0, "refreshes": 0}
+        # Opt-in (CACHE_L1=true) in-process tier in front of Redis
+        self.l1: Optional[LocalCache] = None
+        self._listener: Optional[asyncio.Task] = None
+        if os.getenv("CACHE_L1", "false").lower() == "true":
+            self.l1 = LocalCache(
+                max_entries=int(os.getenv("CACHE_L1_SIZE", 1024)),
+                ttl=float(os.getenv("CACHE_L1_TTL", 30))
+            )
+
+    def _ensure_listener(self):
+        """Start the invalidation subscriber on the running loop (once)"""
+        if self.l1 is not None and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
 
-    def _generate_key(self, prefix: str, data: dict) -> str:
-        """Generate a unique cache key based on input data"""
-        data_str = json.dumps(data, sort_keys=True)
-        return f"{prefix}:{hashlib.md5(data_str.encode()).hexdigest()}"
+    async def _listen(self):
+        """Drop L1 entries when another process writes or invalidates them"""
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    self._on_invalidation(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Without invalidations L1 entries still expire after CACHE_L1_TTL
+            logger.warning("L1 invalidation subscriber stopped: %s", str(e))
+
+    def _on_invalidation(self, message: dict):
+        try:
+            event = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if event.get("origin") == self.instance_id:
+            return
+        self._drop_local(event.get("keys", ()), event.get("pattern"))
+
+    def _drop_local(self, keys: Iterable[str], pattern: str = None):
+        if self.l1 is None:
+            return
+        self.l1.delete(keys)
+        if pattern:
+            self.l1.delete_matching(pattern)
+
+    async def _publish_invalidation(self, keys: Iterable[str] = (), pattern: str = None):
+        if self.l1 is None:
+            return
+        try:
+            await self.redis_client.publish(INVALIDATION_CHANNEL, json.dumps({
+                "origin": self.instance_id,
+                "keys": list(keys),
+                "pattern": pattern
+            }))
+        except Exception as e:
+            logger.warning("L1 invalidation publish failed: %s", str(e))
+
+    def _generate_key(self, prefix: str, *fields: str) -> str:
+        """Cache key from positional fields (fixed order, no JSON/sorting per lookup)"""
+        digest = hashlib.blake2b("\x1f".join(fields).encode(), digest_size=16).hexdigest()
+        return f"{prefix}:{digest}"
+
+    def _chat_key(self, user_id: str, message: str, platform: str) -> str:
+        return self._generate_key("chat", user_id, platform, message)
+
+    async def _read(self, cache_key: str) -> Optional[dict]:
+        """Stored entry `{"value", "soft_expiry", "delta"}` from L1 or Redis"""
+        if self.l1 is not None:
+            self._ensure_listener()
+            local = self.l1.get(cache_key)
+            if local is not MISSING:
+                self.stats["l1_hits"] += 1
+                return local
+            # Value and remaining TTL in one round-trip; L1 must not outlive Redis
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(cache_key)
+                pipe.pttl(cache_key)
+                cached, pttl = await pipe.execute()
+        else:
+            cached, pttl = await self.redis_client.get(cache_key), None
+
+        if not cached:
+            self.stats["misses"] += 1
+            return None
+        try:
+            entry = self.codec.decode(cached)
+        except ValueError as e:
+            logger.warning("Undecodable cache entry %s: %s", cache_key, str(e))
+            self.stats["misses"] += 1
+            return None
+        self.stats["l2_hits"] += 1
+        if "soft_expiry" not in entry:
+            # Written before soft expiry existed: treat as fresh until Redis drops it
+            entry = {"value": entry, "soft_expiry": float("inf"), "delta": 0.0}
+        if self.l1 is not None and pttl and pttl > 0:
+            self.l1.set(cache_key, entry, pttl / 1000)
+        return entry
 
     async def get_cached_response(self, user_id: str, message: str, platform: str) -> Optional[dict]:
-        """Get cached chat response"""
-        cache_key = self._generate_key("chat", {
-            "user_id": user_id,
-            "message": message,
-            "platform": platform
-        })
-        
-        cached = self.redis_client.get(cache_key)
-        return json.loads(cached) if cached else None
-
-    async def cache_response(self, user_id: str, message: str, platform: str, response: dict, ttl: int = None):
-        """Cache a chat response"""
-        cache_key = self._generate_key("chat", {
-            "user_id": user_id,
-            "message": message,
-            "platform": platform
-        })
-        
-        self.redis_client.setex(
-            cache_key,
-            ttl or self.default_ttl,
-            json.dumps(response)
+        """Get cached chat response (possibly past its soft expiry)"""
+        entry = await self._read(self._chat_key(user_id, message, platform))
+        return dict(entry["value"]) if entry is not None else None
+
+    def _tags(self, user_id: str, platform: str) -> List[str]:
+        return [f"user:{user_id}", f"platform:{platform}", f"persona:{self.persona_version}"]
+
+    async def cache_response(
+        self,
+        user_id: str,
+        message: str,
+        platform: str,
+        response: dict,
+        ttl: int = None,
+        compute_time: float = None
+    ):
+        """Cache a chat response, registering it under its user/platform/persona tags.
+
+        `ttl` is the soft expiry; the key itself lives `stale_ttl` longer so
+        stale reads can be served while it is refreshed. `compute_time` (how
+        long the response took to produce) drives XFetch's early refresh.
+        """
+        cache_key = self._chat_key(user_id, message, platform)
+        soft_ttl = ttl or self.default_ttl
+        hard_ttl = int(soft_ttl + self.stale_ttl)
+        entry = {
+            "value": response,
+            "soft_expiry": time.time() + soft_ttl,
+            "delta": compute_time if compute_time is not None else self.default_delta
+        }
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.setex(
+                cache_key,
+                hard_ttl,
+                self.codec.encode(entry)
+            )
+            for tag in self._tags(user_id, platform):
+                pipe.sadd(tag_key(tag), cache_key)
+                # Tag sets live as long as their longest-lived member
+                pipe.expire(tag_key(tag), hard_ttl, gt=True)
+                pipe.expire(tag_key(tag), hard_ttl, nx=True)
+            await pipe.execute()
+        if self.l1 is not None:
+            self._ensure_listener()
+            self.l1.set(cache_key, entry, hard_ttl)
+            await self._publish_invalidation([cache_key])
+
+    def _should_refresh(self, entry: dict, now: float) -> bool:
+        """XFetch: refresh early with probability rising as soft expiry nears.
+
+        `now - delta * beta * ln(rand)` moves the expiry check forward by a
+        random amount scaled by the recompute time, so popular keys are
+        refreshed by one early reader instead of all readers at expiry.
+        """
+        rand = max(self.rng(), 1e-12)
+        return now - entry["delta"] * self.xfetch_beta * math.log(rand) >= entry["soft_expiry"]
+
+    async def get_or_compute(
+        self,
+        user_id: str,
+        message: str,
+        platform: str,
+        compute: Callable[[], Awaitable[dict]],
+        ttl: int = None
+    ) -> dict:
+        """Cached response, computing it on a miss.
+
+        Entries past (or, per XFetch, nearly past) their soft expiry are
+        returned as-is while a single background refresh, guarded by a
+        Redis lock, recomputes them.
+        """
+        cache_key = self._chat_key(user_id, message, platform)
+        entry = await self._read(cache_key)
+        if entry is None:
+            return await self._compute_and_store(user_id, message, platform, compute, ttl)
+        if self._should_refresh(entry, time.time()):
+            self.refresh_stats["stale_served"] += 1
+            self._refresh_in_background(cache_key, user_id, message, platform, compute, ttl)
+        return dict(entry["value"])
+
+    async def _compute_and_store(self, user_id, message, platform, compute, ttl) -> dict:
+        started = time.perf_counter()
+        response = await compute()
+        await self.cache_response(user_id, message, platform, response, ttl, time.perf_counter() - started)
+        return response
+
+    def _refresh_in_background(self, cache_key, user_id, message, platform, compute, ttl):
+        if cache_key in self._refreshing:
+            return
+        task = asyncio.get_running_loop().create_task(
+            self._refresh(cache_key, user_id, message, platform, compute, ttl)
         )
+        self._refreshing[cache_key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(cache_key, None))
+
+    async def _refresh(self, cache_key, user_id, message, platform, compute, ttl):
+        lock_key = f"refresh:{cache_key}"
+        try:
+            # One refresher across all processes; the rest keep serving stale
+            if not await self.redis_client.set(lock_key, self.instance_id, nx=True, ex=self.refresh_lock_ttl):
+                return
+            try:
+                await self._compute_and_store(user_id, message, platform, compute, ttl)
+                self.refresh_stats["refreshes"] += 1
+            finally:
+                # Only our own lock: a slow refresh may have outlived refresh_lock_ttl
+                await release_lock(self.redis_client, lock_key, self.instance_id)
+        except Exception as e:
+            logger.warning("Background cache refresh failed: %s", str(e))
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Delete every entry registered under any of `tags`, e.g. "user:42".
+
+        Members are read with SSCAN and deleted in batches of
+        INVALIDATION_BATCH, so the cost follows the number of affected keys
+        and Redis is never blocked by one large command.
+        """
+        deleted = 0
+        for tag in tags:
+            key = tag_key(tag)
+            batch: List[str] = []
+            async for member in self.redis_client.sscan_iter(key, count=INVALIDATION_BATCH):
+                batch.append(_text(member))
+                if len(batch) >= INVALIDATION_BATCH:
+                    deleted += await self._delete_batch(key, batch)
+                    batch = []
+            if batch:
+                deleted += await self._delete_batch(key, batch)
+            # No DEL of the set itself: members added by a concurrent write
+            # during the scan must keep their tag. Redis drops the set once
+            # the last member is removed, and otherwise it expires on its own.
+        return deleted
+
+    async def _delete_batch(self, tag_set: str, keys: List[str]) -> int:
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(*keys)
+            pipe.srem(tag_set, *keys)
+            removed, _ = await pipe.execute()
+        self._drop_local(keys)
+        await self._publish_invalidation(keys)
+        return removed
 
     async def invalidate_cache(self, pattern: str = None):
-        """Invalidate cache entries matching pattern"""
+        """Invalidate cache entries matching pattern.
+
+        Prefer `invalidate_tags`; this walks the keyspace incrementally with
+        SCAN, which doesn't block Redis but still costs O(database size).
+        """
         if pattern:
-            keys = self.redis_client.keys(f"*{pattern}*")
-            if keys:
-                self.redis_client.delete(*keys) 
\ No newline at end of file
+            batch: List[str] = []
+            async for key in self.redis_client.scan_iter(match=f"*{pattern}*", count=INVALIDATION_BATCH):
+                batch.append(_text(key))
+                if len(batch) >= INVALIDATION_BATCH:
+                    await self.redis_client.delete(*batch)
+                    batch = []
+            if batch:
+                await self.redis_client.delete(*batch)
+            self._drop_local((), f"*{pattern}*")
+            await self._publish_invalidation(pattern=f"*{pattern}*")
+
+    def cache_stats(self) -> dict:
+        """Hit counts per tier; `l1_hit_rate` is the share of lookups served in-process"""
+        lookups = sum(self.stats.values())
+        return {
+            **self.stats,
+            "l1_hit_rate": self.stats["l1_hits"] / lookups if lookups else 0.0,
+            "l2_hit_rate": self.stats["l2_hits"] / lookups if lookups else 0.0,
+            "l1_entries": len(self.l1) if self.l1 is not None else 0,
+            **self.refresh_stats
+        }
@@ -0,0 +1,18 @@
+# In-character stand-ins used when the model can't answer in time
+SLOW_REPLIES = [
+    "Mrrp. Busy watching pigeons on the fire escape. Ask me again in a sec. 😾",
+    "The radiator's warm and I'm mid-nap. Try me again.",
+    "Hold that thought, a siren just went by and I have to judge it.",
+    "I heard you. I'm choosing to ignore you for a moment. Ask again.",
+    "Windowsill duty. Very important. Back in a minute, human.",
+    "Too comfy to think right now. Poke me again later. 😹",
+]
+
+# Answers to bare greetings, which never need the model
+GREETING_REPLIES = [
+    "Mrrp. Hi. You're blocking my sunbeam. 😾",
+    "Oh. It's you. Hello, I guess.",
+    "*slow blink* ...hey.",
+    "Meow. Make it quick, the radiator just kicked on.",
+    "Hey human. Got treats or just small talk?",
+]
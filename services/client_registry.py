@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+class ClientRegistry:
+    """Process-wide cache of expensive clients (SDK clients, connection pools).
+
+    Module state survives warm Lambda invocations, so clients built here keep
+    their keep-alive connections between requests. Each entry remembers a
+    fingerprint of the config it was built from; a different fingerprint
+    (e.g. a rotated API key) rebuilds the client.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Any] = {}
+        self._fingerprints: Dict[str, Hashable] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        # Reentrant: a factory may build the clients it depends on (idempotency -> redis)
+        self._lock = threading.RLock()
+
+    def get(self, name: str, factory: Callable[[], Any], fingerprint: Hashable = None) -> Any:
+        """Return the cached client for `name`, building it with `factory` if needed"""
+        if name in self._clients and self._fingerprints.get(name) == fingerprint:
+            self._record(name, reused=True)
+            return self._clients[name]
+
+        with self._lock:
+            # Another thread may have built it while we waited
+            if name in self._clients and self._fingerprints.get(name) == fingerprint:
+                self._record(name, reused=True)
+                return self._clients[name]
+
+            if name in self._clients:
+                logger.info("Config changed for client %s; rebuilding", name)
+                self._close(self._clients.pop(name))
+
+            start = time.perf_counter()
+            client = factory()
+            build_ms = (time.perf_counter() - start) * 1000
+
+            self._clients[name] = client
+            self._fingerprints[name] = fingerprint
+            self._record(name, reused=False, build_ms=build_ms)
+            return client
+
+    def peek(self, name: str) -> Optional[Any]:
+        """Return the cached client without building or counting it"""
+        return self._clients.get(name)
+
+    def last_reused(self, name: str) -> bool:
+        """Whether the most recent `get` for `name` returned an existing client"""
+        return bool(self._stats.get(name, {}).get("last_reused"))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-client build/reuse counters and last build time"""
+        return {name: dict(values) for name, values in self._stats.items()}
+
+    def clear(self):
+        """Drop every cached client (used by tests and config reloads)"""
+        with self._lock:
+            for client in self._clients.values():
+                self._close(client)
+            self._clients.clear()
+            self._fingerprints.clear()
+            self._stats.clear()
+
+    def _record(self, name: str, reused: bool, build_ms: float = 0.0):
+        stats = self._stats.setdefault(name, {"built": 0, "reused": 0, "build_ms": 0.0})
+        if reused:
+            stats["reused"] += 1
+        else:
+            stats["built"] += 1
+            stats["build_ms"] = build_ms
+        stats["last_reused"] = reused
+
+    @staticmethod
+    def _close(client: Any):
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.warning("Error closing replaced client: %s", str(e))
+
+# Shared instance used by the Lambda handler and services
+registry = ClientRegistry()
@@ -0,0 +1,157 @@
+import json
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .request_log import annotate
+
+logger = logging.getLogger(__name__)
+
+# How a command produces its response body
+STATIC = "static"        # one envelope, serialized at registration
+CACHED = "cached"        # picked from a set of envelopes serialized at registration
+GENERATED = "generated"  # built per request
+
+def message_envelope(content: str) -> Dict[str, Any]:
+    """CHANNEL_MESSAGE_WITH_SOURCE response carrying `content`"""
+    return {'type': 4, 'data': {'content': content}}
+
+def serialize(payload: Dict[str, Any]) -> str:
+    """Serialize a response envelope the same way for every command.
+
+    Bodies stay `str` because API Gateway proxy integrations require a
+    string body; encoding to bytes here would only be decoded again.
+    """
+    return json.dumps(payload)
+
+class ShuffleBag:
+    """Random draws that never repeat within a cycle.
+
+    Every item is served once per cycle in shuffled order, and the first
+    draw of a new cycle is never the item that ended the previous one.
+    """
+
+    def __init__(self, items: Sequence[Any], rng: random.Random = None):
+        if not items:
+            raise ValueError("ShuffleBag needs at least one item")
+        self._items = list(items)
+        self._rng = rng or random.Random()
+        self._bag: List[int] = []
+        self._last: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def next(self) -> Any:
+        if not self._bag:
+            self._bag = list(range(len(self._items)))
+            self._rng.shuffle(self._bag)
+            # Items are popped from the end; keep the cycle boundary repeat-free
+            if len(self._bag) > 1 and self._bag[-1] == self._last:
+                self._bag[0], self._bag[-1] = self._bag[-1], self._bag[0]
+        idx = self._bag.pop()
+        self._last = idx
+        return self._items[idx]
+
+class CommandStats:
+    """Per-command call, error and latency counters"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float, error: bool = False):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+        if error:
+            self.errors += 1
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'avg_ms': self.total_ms / self.calls if self.calls else 0.0,
+            'max_ms': self.max_ms
+        }
+
+class Command:
+    def __init__(self, name: str, kind: str, respond: Callable[[dict], str], error_body: str):
+        self.name = name
+        self.kind = kind
+        self.respond = respond
+        self.error_body = error_body
+        self.stats = CommandStats()
+
+class CommandRouter:
+    """Registry of slash commands, each declared as static, cached or generated.
+
+    Static and cached commands serialize their envelopes once when they are
+    registered, so serving them is a lookup rather than a `json.dumps`.
+    """
+
+    def __init__(self, unknown_content: str, error_content: str):
+        self.commands: Dict[str, Command] = {}
+        self.unknown_body = serialize(message_envelope(unknown_content))
+        self.error_body = serialize(message_envelope(error_content))
+        self.unknown_stats = CommandStats()
+
+    def static(self, name: str, content: str):
+        """Register a command that always answers with the same message"""
+        body = serialize(message_envelope(content))
+        self._register(name, STATIC, lambda _: body)
+
+    def cached(self, name: str, contents: Sequence[str]):
+        """Register a command answering with a shuffle-bag draw from `contents`"""
+        bag = ShuffleBag([serialize(message_envelope(content)) for content in contents])
+        self._register(name, CACHED, lambda _: bag.next())
+
+    def generated(self, name: str, error_content: str = None):
+        """Decorator registering a handler that builds its envelope per request"""
+        def decorator(handler: Callable[[dict], Dict[str, Any]]):
+            self._register(name, GENERATED, lambda body: serialize(handler(body)), error_content)
+            return handler
+        return decorator
+
+    def kind(self, body: dict) -> Optional[str]:
+        """Declared kind of the interaction's command, or None if unknown"""
+        command = self.commands.get((body.get('data') or {}).get('name', ''))
+        return command.kind if command else None
+
+    def dispatch(self, body: dict) -> str:
+        """Serialized response body for an APPLICATION_COMMAND interaction"""
+        return self.dispatch_result(body)[0]
+
+    def dispatch_result(self, body: dict) -> Tuple[str, bool]:
+        """`(body, ok)`, where `ok` is False if the handler failed and its error envelope was served"""
+        name = (body.get('data') or {}).get('name', '')
+        command = self.commands.get(name)
+        if command is None:
+            self.unknown_stats.record(0.0)
+            return self.unknown_body, True
+
+        start = time.perf_counter()
+        try:
+            response = command.respond(body)
+            ok = True
+        except Exception as e:
+            logger.error(f"Command error in /{name}: {str(e)}")
+            response, ok = command.error_body, False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        command.stats.record(elapsed_ms, error=not ok)
+        annotate(command=name, command_ms=round(elapsed_ms, 2), command_error=not ok)
+        return response, ok
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Counters for every registered command, plus unknown commands"""
+        stats = {name: command.stats.as_dict() for name, command in self.commands.items()}
+        stats['<unknown>'] = self.unknown_stats.as_dict()
+        return stats
+
+    def _register(self, name: str, kind: str, respond: Callable[[dict], str], error_content: str = None):
+        error_body = serialize(message_envelope(error_content)) if error_content else self.error_body
+        self.commands[name] = Command(name, kind, respond, error_body)
@@ -0,0 +1,33 @@
+import time
+from typing import Optional
+
+class EditThrottle:
+    """Paces progressive message edits while a reply streams in.
+
+    Discord rate-limits edits per webhook/message, so intermediate edits are
+    spaced at least `min_interval` seconds apart. The first edit is due
+    immediately so the first tokens show up without delay. A 429 pushes the next
+    allowed edit out by the server's `retry_after`. The final edit should
+    always be sent regardless of `due()`.
+    """
+
+    def __init__(self, min_interval: float = 1.0, clock=time.monotonic):
+        self.min_interval = min_interval
+        self.clock = clock
+        self.edits = 0
+        self.rate_limited = 0
+        self._next_at = clock()
+
+    def due(self) -> bool:
+        return self.clock() >= self._next_at
+
+    def mark(self):
+        """Record a sent edit"""
+        self.edits += 1
+        self._next_at = self.clock() + self.min_interval
+
+    def backoff(self, retry_after: Optional[float]):
+        """Record a 429 and hold edits until the rate limit resets"""
+        self.rate_limited += 1
+        wait = retry_after if retry_after is not None else self.min_interval
+        self._next_at = self.clock() + max(wait, self.min_interval)
@@ -0,0 +1,90 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+class Hedger:
+    """Sends a duplicate request when the first one is slower than `hedge_delay`.
+
+    `hedge_delay` should sit around the backend's p95 latency: the 5% of
+    calls stuck in the tail get a second chance, the winner is used and the
+    loser is cancelled. `None` disables hedging.
+    """
+
+    def __init__(self, hedge_delay: Optional[float] = None):
+        self.hedge_delay = hedge_delay
+        self.stats: Dict[str, int] = {"calls": 0, "hedged": 0, "hedge_wins": 0}
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Await `call()`, racing a second `call()` if the first is slow"""
+        self.stats["calls"] += 1
+        primary = asyncio.ensure_future(call())
+        tasks = {primary}
+        try:
+            if self.hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+                if not done:
+                    self.stats["hedged"] += 1
+                    tasks.add(asyncio.ensure_future(call()))
+
+            error = None
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream(self, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Iterate `factory()`, hedging on time to the first item.
+
+        Whichever stream produces its first item first is kept; the other is
+        cancelled and closed.
+        """
+        self.stats["calls"] += 1
+        primary = factory()
+        contenders = {asyncio.ensure_future(primary.__anext__()): primary}
+        winner = None
+        try:
+            if self.hedge_delay is not None:
+                done, _ = await asyncio.wait(contenders.keys(), timeout=self.hedge_delay)
+                if not done:
+                    self.stats["hedged"] += 1
+                    backup = factory()
+                    contenders[asyncio.ensure_future(backup.__anext__())] = backup
+
+            error = None
+            while winner is None and contenders:
+                done, _ = await asyncio.wait(contenders.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stream = contenders.pop(task)
+                    if task.exception() is None or isinstance(task.exception(), StopAsyncIteration):
+                        winner = (task, stream)
+                        break
+                    error = task.exception()
+            if winner is None:
+                raise error
+        finally:
+            for task, stream in contenders.items():
+                task.cancel()
+                try:
+                    await task
+                except BaseException:
+                    pass
+                await stream.aclose()
+
+        task, stream = winner
+        if stream is not primary:
+            self.stats["hedge_wins"] += 1
+        if isinstance(task.exception(), StopAsyncIteration):
+            return
+        yield task.result()
+        async for item in stream:
+            yield item
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stored while the first delivery of an interaction is still being handled
+PENDING = "__pending__"
+
+class IdempotencyService:
+    """Deduplicates Discord interactions by id.
+
+    The first delivery of an interaction claims its id and stores the
+    response it produced; retries and duplicates get that stored response,
+    or wait for the in-flight one, instead of running the command again.
+    Claims are checked in process memory first and then in Redis (when a
+    client is given) so duplicates landing on other containers are caught.
+    After a Redis error, Redis is skipped for `redis_cooldown` seconds so a
+    degraded server costs one timeout rather than one per call.
+    """
+
+    def __init__(self, redis_client=None, ttl: int = 120, prefix: str = "interaction", redis_cooldown: float = 30.0):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis_cooldown = redis_cooldown
+        self._redis_down_until = 0.0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._events = {}
+        self._lock = threading.Lock()
+        self.stats = {"claimed": 0, "replayed": 0, "joined": 0, "redis_errors": 0}
+
+    def claim(self, interaction_id: str, wait: float = 0.0) -> Tuple[bool, Optional[str]]:
+        """Try to take ownership of `interaction_id`.
+
+        Returns `(True, None)` when the caller should handle the interaction,
+        otherwise `(False, body)` with the stored response. `body` is None if
+        the owner has not finished within `wait` seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            entry = self._entries.get(interaction_id)
+            if entry is None:
+                if self._claim_remote(interaction_id):
+                    self._entries[interaction_id] = (now + self.ttl, PENDING)
+                    self._events[interaction_id] = threading.Event()
+                    self.stats["claimed"] += 1
+                    return True, None
+                # Another container owns it. Not cached locally: if that owner
+                # releases the claim, the next retry here must be able to take it
+            elif entry[1] != PENDING:
+                self.stats["replayed"] += 1
+                return False, entry[1]
+            event = self._events.get(interaction_id)
+
+        body = self._join(interaction_id, event, wait)
+        if body is not None:
+            self.stats["joined"] += 1
+        return False, body
+
+    def complete(self, interaction_id: str, body: str):
+        """Store the response produced for a claimed interaction"""
+        with self._lock:
+            self._entries[interaction_id] = (time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(interaction_id)
+            event = self._events.pop(interaction_id, None)
+        if event is not None:
+            event.set()
+        client = self._remote()
+        if client is not None:
+            try:
+                client.set(self._key(interaction_id), body, ex=self.ttl)
+            except Exception as e:
+                self._remote_failed("store", interaction_id, e)
+
+    def release(self, interaction_id: str):
+        """Give up a claim without a response so a retry can run the command"""
+        with self._lock:
+            self._entries.pop(interaction_id, None)
+            event = self._events.pop(interaction_id, None)
+        if event is not None:
+            event.set()
+        client = self._remote()
+        if client is not None:
+            try:
+                client.delete(self._key(interaction_id))
+            except Exception as e:
+                self._remote_failed("release", interaction_id, e)
+
+    def _remote(self):
+        """The Redis client, or None when unconfigured or cooling down after an error"""
+        if self.redis_client is None or time.monotonic() < self._redis_down_until:
+            return None
+        return self.redis_client
+
+    def _remote_failed(self, operation: str, interaction_id: str, error: Exception):
+        # Redis trouble should not block replies; use local dedupe only for a while
+        self.stats["redis_errors"] += 1
+        self._redis_down_until = time.monotonic() + self.redis_cooldown
+        logger.warning("Idempotency %s failed for %s, skipping Redis for %.0fs: %s",
+                       operation, interaction_id, self.redis_cooldown, str(error))
+
+    def _claim_remote(self, interaction_id: str) -> bool:
+        client = self._remote()
+        if client is None:
+            return True
+        try:
+            return bool(client.set(self._key(interaction_id), PENDING, nx=True, ex=self.ttl))
+        except Exception as e:
+            self._remote_failed("claim", interaction_id, e)
+            return True
+
+    def _join(self, interaction_id: str, event: Optional[threading.Event], wait: float) -> Optional[str]:
+        """Wait up to `wait` seconds for the owner's response"""
+        deadline = time.monotonic() + wait
+        if event is not None:
+            event.wait(wait)
+        while True:
+            body = self._lookup(interaction_id)
+            if body is not None or time.monotonic() >= deadline:
+                return body
+            time.sleep(0.05)
+
+    def _lookup(self, interaction_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(interaction_id)
+        if entry is not None and entry[1] != PENDING:
+            return entry[1]
+        client = self._remote()
+        if client is None:
+            return None
+        try:
+            body = client.get(self._key(interaction_id))
+        except Exception as e:
+            self._remote_failed("lookup", interaction_id, e)
+            return None
+        if body is None or body == PENDING:
+            return None
+        with self._lock:
+            self._entries[interaction_id] = (time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(interaction_id)
+        return body
+
+    def _purge(self, now: float):
+        # Entries are appended in claim order, so expired ones sit at the front
+        while self._entries:
+            interaction_id, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            self._entries.popitem(last=False)
+            self._events.pop(interaction_id, None)
+
+    def _key(self, interaction_id: str) -> str:
+        return f"{self.prefix}:{interaction_id}"
@@ -1,23 +1,29 @@
-import redis
+import asyncio
 import json
-import boto3
 from typing import List, Dict
 import os
 import time
+from .redis_pool import get_redis
+from .write_behind import WriteBehindBuffer, get_write_behind
+
+# Messages kept in the Redis short-term history
+HISTORY_LENGTH = 10
 
 class MemoryService:
-    def __init__(self):
-        self.redis_client = redis.Redis(
-            host=os.getenv("REDIS_HOST", "localhost"),
-            port=int(os.getenv("REDIS_PORT", 6379)),
-            decode_responses=True
-        )
-        self.dynamodb = boto3.resource('dynamodb')
-        self.table = self.dynamodb.Table(os.getenv("DYNAMODB_TABLE"))
+    def __init__(self, redis_client=None, table=None, writer: WriteBehindBuffer = None):
+        # Shared non-blocking pool unless a client is injected
+        self.redis_client = redis_client or get_redis()
+        if table is None:
+            import boto3
+            self.dynamodb = boto3.resource('dynamodb')
+            table = self.dynamodb.Table(os.getenv("DYNAMODB_TABLE"))
+        self.table = table
+        # Interactions are buffered and written in BatchWriteItem chunks
+        self.writer = writer if writer is not None else get_write_behind()
 
     async def get_chat_history(self, user_id: str) -> List[Dict[str, str]]:
         # First check Redis for recent history
-        recent_history = self.redis_client.lrange(f"chat_history:{user_id}", 0, -1)
+        recent_history = await self.redis_client.lrange(f"chat_history:{user_id}", 0, -1)
         
         if recent_history:
             return [json.loads(msg) for msg in recent_history]
@@ -46,26 +52,28 @@ class MemoryService:
         response: str, 
         platform: str
     ):
-        # Store in Redis for short-term memory
+        # Both turns and the trim in one MULTI round-trip, so concurrent
+        # messages from the same user can't interleave or leave the list long
         chat_key = f"chat_history:{user_id}"
-        
-        self.redis_client.lpush(
-            chat_key,
-            json.dumps({"role": "user", "content": message})
-        )
-        self.redis_client.lpush(
-            chat_key,
-            json.dumps({"role": "assistant", "content": response})
-        )
-        
-        # Trim to last 10 messages
-        self.redis_client.ltrim(chat_key, 0, 9)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.lpush(
+                chat_key,
+                json.dumps({"role": "user", "content": message}),
+                json.dumps({"role": "assistant", "content": response})
+            )
+            pipe.ltrim(chat_key, 0, HISTORY_LENGTH - 1)
+            await pipe.execute()
 
-        # Store in DynamoDB for long-term memory
-        self.table.put_item(Item={
+        # Long-term memory is written behind; the reply doesn't wait on it
+        self.writer.add({
             'user_id': user_id,
-            'timestamp': int(time.time()),
+            # Milliseconds so two messages in the same second don't overwrite each other
+            'timestamp': time.time_ns() // 1_000_000,
             'message': message,
             'response': response,
             'platform': platform
-        }) 
\ No newline at end of file
+        })
+
+    async def flush(self):
+        """Drain buffered DynamoDB writes (shutdown, end of a Lambda invocation)"""
+        await asyncio.to_thread(self.writer.flush)
@@ -0,0 +1,122 @@
+import os
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from .similarity_cache import normalize_message
+
+class Route(NamedTuple):
+    name: str
+    model: Optional[str]  # None: answered locally, no model call
+    max_tokens: int
+    temperature: float = 0.8
+
+GREETING = Route("greeting", None, 0)
+FAST = Route("fast", "gpt-4o-mini", 80)
+STANDARD = Route("standard", "gpt-4o-mini", 200)
+LARGE = Route("large", "gpt-4o", 400, 0.7)
+
+GREETINGS = {
+    "hi", "hey", "hello", "yo", "sup", "hiya", "howdy", "meow", "mew", "purr",
+    "good morning", "good night", "gm", "gn", "whats up", "what s up",
+    *(f"{hello} {name}" for hello in ("hi", "hey", "hello") for name in ("creme", "crème", "creme brulee", "crème brûlée"))
+}
+
+# Each of these is one complexity signal; a prompt needs `large_signals` of them
+_TASK = re.compile(
+    r"\b(explain|compare|step[- ]by[- ]step|summari[sz]e|translate|difference between|"
+    r"pros and cons|write (me )?(a|an|some)|how (do|does|can|would|should) (i|you|we|it))\b",
+    re.IGNORECASE
+)
+_CODE = re.compile(r"```|\bdef \w+\(|\bfunction \w+\(|\bclass \w+[:(]")
+# A question is a run of text ending in one or more "?"; "why??" is one question
+_QUESTION = re.compile(r"[^?]+\?+")
+
+class ModelRouter:
+    """Rule-based tiering of chat prompts by how much model they need.
+
+    Greetings get a local canned reply and short chit-chat goes to the fast
+    tier with a small `max_tokens`. A prompt reaches the large tier only when
+    it shows at least `large_signals` of: a task verb (explain, compare,
+    summarize...), code, more than `long_words` words, or several distinct
+    questions. Prompts with one signal, or carrying conversation history, get
+    STANDARD. Disabled routers send everything to STANDARD.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        fast: Route = FAST,
+        standard: Route = STANDARD,
+        large: Route = LARGE,
+        short_words: int = 12,
+        long_words: int = 60,
+        large_signals: int = 2
+    ):
+        self.enabled = enabled
+        self.fast = fast
+        self.standard = standard
+        self.large = large
+        self.short_words = short_words
+        self.long_words = long_words
+        self.large_signals = large_signals
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def signals(self, message: str, words: int) -> int:
+        """How many independent complexity signals `message` shows"""
+        return sum((
+            bool(_TASK.search(message)),
+            bool(_CODE.search(message)),
+            words > self.long_words,
+            len(_QUESTION.findall(message)) > 1
+        ))
+
+    def route(self, message: str, history: Optional[List[Dict[str, str]]] = None) -> Route:
+        if not self.enabled:
+            return self.standard
+        normalized = normalize_message(message)
+        words = len(normalized.split())
+        if not history and normalized in GREETINGS:
+            return GREETING
+        signals = self.signals(message, words)
+        if signals >= self.large_signals:
+            return self.large
+        if history or signals or words > self.short_words:
+            return self.standard
+        return self.fast
+
+    def record(
+        self,
+        route: Route,
+        started: float,
+        tokens_saved: int = 0,
+        usage: Optional[Dict[str, int]] = None
+    ) -> Dict[str, float]:
+        """Account one routed request; returns the fields worth logging.
+
+        `usage` is the completion's reported token usage (absent for
+        greetings, coalesced callers and cache hits, which cost nothing);
+        `tokens_saved` is the prompt a local greeting reply didn't send.
+        """
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        entry = self.stats.setdefault(route.name, {
+            "count": 0, "latency_ms": 0.0, "tokens_saved": 0, "prompt_tokens": 0, "completion_tokens": 0
+        })
+        entry["count"] += 1
+        entry["latency_ms"] += latency_ms
+        entry["tokens_saved"] += tokens_saved
+        fields = {"route": route.name, "route_ms": latency_ms}
+        if tokens_saved:
+            fields["tokens_saved"] = tokens_saved
+        if usage:
+            entry["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            entry["completion_tokens"] += usage.get("completion_tokens", 0)
+            fields["completion_tokens"] = usage.get("completion_tokens", 0)
+        return fields
+
+def router_from_env() -> ModelRouter:
+    """ModelRouter enabled by MODEL_ROUTING=true, large tier from CHAT_LARGE_MODEL"""
+    return ModelRouter(
+        enabled=os.getenv("MODEL_ROUTING", "false").lower() == "true",
+        large=LARGE._replace(model=os.getenv("CHAT_LARGE_MODEL", LARGE.model))
+    )
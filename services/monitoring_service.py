@@ -1,3 +1,4 @@
+import asyncio
 import boto3
 from datetime import datetime
 import time
@@ -49,7 +50,8 @@ class MonitoringService:
         user_id: str,
         platform: str,
         response_length: int,
-        processing_time: float
+        processing_time: float,
+        prompt_tokens: int = None
     ):
         metrics = [
             {
@@ -69,8 +71,49 @@ class MonitoringService:
                 ]
             }
         ]
+        if prompt_tokens is not None:
+            metrics.append({
+                'MetricName': 'ChatPromptTokens',
+                'Value': float(prompt_tokens),
+                'Unit': 'Count',
+                'Dimensions': [
+                    {'Name': 'Platform', 'Value': platform}
+                ]
+            })
         
         self.cloudwatch.put_metric_data(
             Namespace=self.namespace,
             MetricData=metrics
-        ) 
\ No newline at end of file
+        )
+
+    async def log_backend_metrics(self, backend: str, snapshot: Dict[str, Any]):
+        """Export a BackendGuard snapshot (circuit state, concurrency limit)"""
+        dimensions = [{'Name': 'Backend', 'Value': backend}]
+        state_values = {'closed': 0.0, 'half_open': 1.0, 'open': 2.0}
+        metrics = [
+            {
+                'MetricName': 'CircuitState',
+                'Value': state_values.get(snapshot['circuit_state'], 0.0),
+                'Unit': 'None',
+                'Dimensions': dimensions
+            },
+            {
+                'MetricName': 'ConcurrencyLimit',
+                'Value': float(snapshot['concurrency_limit']),
+                'Unit': 'Count',
+                'Dimensions': dimensions
+            },
+            {
+                'MetricName': 'BackendInFlight',
+                'Value': float(snapshot['inflight']),
+                'Unit': 'Count',
+                'Dimensions': dimensions
+            }
+        ]
+
+        # boto3 is synchronous; keep the HTTP call off the event loop
+        await asyncio.to_thread(
+            self.cloudwatch.put_metric_data,
+            Namespace=self.namespace,
+            MetricData=metrics
+        )
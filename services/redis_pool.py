@@ -0,0 +1,58 @@
+import os
+import threading
+from typing import Optional
+
+# One non-blocking client (and connection pool) for the whole process
+_client: Optional["redis.asyncio.Redis"] = None
+_lock = threading.Lock()
+
+def get_redis() -> "redis.asyncio.Redis":
+    """Shared `redis.asyncio` client for CacheService, MemoryService and SingleFlight.
+
+    Sized and tuned from the environment: REDIS_MAX_CONNECTIONS caps the
+    pool, REDIS_HEALTH_CHECK_INTERVAL pings connections that sat idle that
+    long before reusing them. Replies are raw bytes; callers decode. Like
+    the OpenAI pool, connections belong to the event loop that opened them,
+    so drive it from one loop per process.
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            import redis.asyncio
+            pool = redis.asyncio.BlockingConnectionPool(
+                host=os.getenv("REDIS_HOST", "localhost"),
+                port=int(os.getenv("REDIS_PORT", 6379)),
+                max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", 50)),
+                timeout=float(os.getenv("REDIS_POOL_TIMEOUT", 2.0)),
+                health_check_interval=int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30)),
+                socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", 2.0)),
+                socket_connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", 2.0)),
+                socket_keepalive=True,
+                decode_responses=False
+            )
+            _client = redis.asyncio.Redis(connection_pool=pool)
+        return _client
+
+async def close_redis():
+    """Close the shared pool (app shutdown)"""
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        await client.connection_pool.disconnect()
+
+# Compare-and-delete: drop a lock only while it still holds the caller's token
+RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+async def release_lock(client, key: str, token: str) -> bool:
+    """Delete lock `key` if `token` still owns it.
+
+    A holder that outlived the lock's TTL must not delete the lock another
+    process has taken since; GET and DEL run atomically in one script.
+    """
+    return bool(await client.eval(RELEASE_LOCK, 1, key, token))
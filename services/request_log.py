@@ -0,0 +1,98 @@
+import contextvars
+import json
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, Optional
+
+_current = contextvars.ContextVar("request_record", default=None)
+
+class _JsonLine:
+    """Serializes lazily: `json.dumps` only runs if a handler formats the record"""
+
+    __slots__ = ("fields",)
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return json.dumps(self.fields, default=str, separators=(",", ":"))
+
+class RequestRecord:
+    """Fields and timings for one request, emitted as a single JSON log line"""
+
+    def __init__(self, request_log: "RequestLog", fields: Dict[str, Any]):
+        self.request_log = request_log
+        self.fields = fields
+        self.timings: Dict[str, float] = {}
+        self.failed = False
+        self._start = time.perf_counter()
+        self._token = None
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def mark(self, name: str):
+        """Record milliseconds elapsed since the request started under `name`"""
+        self.timings[name] = round((time.perf_counter() - self._start) * 1000, 2)
+
+    def error(self, exc: BaseException = None, **fields):
+        """Flag the request as failed; failed requests are never sampled out"""
+        self.failed = True
+        if exc is not None:
+            fields.setdefault("error", f"{type(exc).__name__}: {exc}")
+        self.fields.update(fields)
+
+    def emit(self):
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        self.mark("total_ms")
+        self.request_log.emit(self)
+
+class RequestLog:
+    """Sampled, structured per-request logging.
+
+    Successful requests are logged with probability `sample_rate`; failures
+    (an explicit `error()` or a 4xx/5xx `status`) are always logged.
+    """
+
+    def __init__(self, logger: logging.Logger, sample_rate: float = 1.0, rng: Callable[[], float] = random.random):
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.rng = rng
+        self.stats = {"emitted": 0, "sampled_out": 0}
+
+    def start(self, **fields) -> RequestRecord:
+        """Begin a record and make it the current one for `annotate`"""
+        record = RequestRecord(self, fields)
+        record._token = _current.set(record)
+        return record
+
+    def emit(self, record: RequestRecord):
+        status = record.fields.get("status")
+        failed = record.failed or (isinstance(status, int) and status >= 400)
+        if not failed and (self.sample_rate <= 0 or self.rng() >= self.sample_rate):
+            self.stats["sampled_out"] += 1
+            return
+
+        level = logging.ERROR if failed else logging.INFO
+        if not self.logger.isEnabledFor(level):
+            return
+        fields = dict(record.fields)
+        fields["timings"] = record.timings
+        if not failed:
+            # Lets log queries re-weight sampled success lines
+            fields["sample_rate"] = self.sample_rate
+        self.stats["emitted"] += 1
+        self.logger.log(level, "%s", _JsonLine(fields))
+
+def current_record() -> Optional[RequestRecord]:
+    """The record of the request being handled, if any"""
+    return _current.get()
+
+def annotate(**fields):
+    """Attach fields to the current request's log line (no-op outside a request)"""
+    record = _current.get()
+    if record is not None:
+        record.fields.update(fields)
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class BackendUnavailable(Exception):
+    """The call was refused locally, without reaching the backend"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"backend unavailable ({reason})")
+        self.reason = reason
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit driven by observed latency.
+
+    Each call that finishes under `target_latency` grows the limit by
+    1/limit (about +1 per limit's worth of calls); a slow or failed call
+    shrinks it by `backoff`. Callers over the limit wait up to `max_wait`
+    for a slot and are then rejected, so a degraded backend sheds load
+    instead of accumulating queued requests.
+    """
+
+    def __init__(
+        self,
+        initial: float = 20,
+        min_limit: float = 2,
+        max_limit: float = 100,
+        target_latency: float = 5.0,
+        backoff: float = 0.7,
+        max_wait: float = 1.0
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.inflight = 0
+        self._released: Optional[asyncio.Event] = None
+        self.stats = {"admitted": 0, "rejected": 0, "decreases": 0}
+
+    async def acquire(self):
+        if self._released is None:
+            self._released = asyncio.Event()
+        deadline = time.monotonic() + self.max_wait
+        while self.inflight >= int(self.limit):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats["rejected"] += 1
+                raise BackendUnavailable("overloaded")
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        self.inflight += 1
+        self.stats["admitted"] += 1
+
+    def release(self, latency: Optional[float] = None, failed: bool = False):
+        """Free a slot; `latency=None` (e.g. a cancelled call) leaves the limit alone"""
+        self.inflight -= 1
+        if failed or (latency is not None and latency > self.target_latency):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self.stats["decreases"] += 1
+        elif latency is not None:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        if self._released is not None:
+            self._released.set()
+
+class CircuitBreaker:
+    """Fails fast after `failure_threshold` consecutive failures.
+
+    While open every call is refused; after `reset_timeout` seconds up to
+    `half_open_max` trial calls are let through. A successful trial closes
+    the breaker, a failed one re-opens it for another `reset_timeout`.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trials = 0
+        self.stats = {"opened": 0, "short_circuited": 0}
+
+    def allow(self) -> bool:
+        if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self.state, self.trials = HALF_OPEN, 0
+            logger.info("Circuit half-open, probing backend")
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self.trials < self.half_open_max:
+            self.trials += 1
+            return True
+        self.stats["short_circuited"] += 1
+        return False
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info("Circuit closed, backend recovered")
+        self.state, self.failures = CLOSED, 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.stats["opened"] += 1
+                logger.warning("Circuit opened after %d failures", self.failures)
+            self.state, self.opened_at = OPEN, self.clock()
+
+    def release_trial(self):
+        """A half-open trial ended without a verdict (cancelled)"""
+        if self.state == HALF_OPEN and self.trials > 0:
+            self.trials -= 1
+
+class _Slot:
+    def __init__(self):
+        self.start = time.monotonic()
+        self.latency: Optional[float] = None
+
+    def mark(self):
+        """Record latency now, e.g. at a stream's first token"""
+        if self.latency is None:
+            self.latency = time.monotonic() - self.start
+
+class BackendGuard:
+    """Circuit breaker in front of an adaptive limiter for one backend.
+
+        async with guard.slot() as slot:
+            ...  # call the backend; optionally slot.mark() at first byte
+    """
+
+    def __init__(self, limiter: AdaptiveLimiter, breaker: CircuitBreaker):
+        self.limiter = limiter
+        self.breaker = breaker
+
+    def slot(self) -> "_GuardedCall":
+        return _GuardedCall(self)
+
+    def is_quiet(self, fraction: float = 0.25) -> bool:
+        """Closed circuit and under `fraction` of the concurrency limit in use"""
+        return self.breaker.state == CLOSED and self.limiter.inflight < self.limiter.limit * fraction
+
+    def snapshot(self) -> Dict[str, float]:
+        """Current state for metrics export"""
+        return {
+            "circuit_state": self.breaker.state,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "inflight": self.limiter.inflight,
+            "rejected": self.limiter.stats["rejected"],
+            "short_circuited": self.breaker.stats["short_circuited"],
+            "circuit_opened": self.breaker.stats["opened"]
+        }
+
+class _GuardedCall:
+    def __init__(self, guard: BackendGuard):
+        self.guard = guard
+        self.slot: Optional[_Slot] = None
+
+    async def __aenter__(self) -> _Slot:
+        if not self.guard.breaker.allow():
+            raise BackendUnavailable("circuit_open")
+        try:
+            await self.guard.limiter.acquire()
+        except BaseException:
+            self.guard.breaker.release_trial()
+            raise
+        self.slot = _Slot()
+        return self.slot
+
+    async def __aexit__(self, exc_type, exc, tb):
+        breaker, limiter = self.guard.breaker, self.guard.limiter
+        if exc_type is not None and issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            # Hedge losers and abandoned streams say nothing about backend health
+            limiter.release()
+            breaker.release_trial()
+        elif exc_type is not None:
+            limiter.release(failed=True)
+            breaker.record_failure()
+        else:
+            self.slot.mark()
+            limiter.release(self.slot.latency)
+            breaker.record_success()
+        return False
+
+_shared: Optional[BackendGuard] = None
+
+def get_backend_guard() -> BackendGuard:
+    """Process-wide guard for the OpenAI backend, tuned from the environment"""
+    global _shared
+    if _shared is None:
+        _shared = BackendGuard(
+            AdaptiveLimiter(
+                initial=float(os.getenv("CHAT_CONCURRENCY_INITIAL", 20)),
+                min_limit=float(os.getenv("CHAT_CONCURRENCY_MIN", 2)),
+                max_limit=float(os.getenv("CHAT_CONCURRENCY_MAX", 100)),
+                target_latency=float(os.getenv("CHAT_TARGET_LATENCY", 5.0)),
+                max_wait=float(os.getenv("CHAT_CONCURRENCY_WAIT", 1.0))
+            ),
+            CircuitBreaker(
+                failure_threshold=int(os.getenv("CHAT_BREAKER_FAILURES", 5)),
+                reset_timeout=float(os.getenv("CHAT_BREAKER_RESET", 30.0))
+            )
+        )
+    return _shared
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Set
+
+from .similarity_cache import normalize_message
+
+logger = logging.getLogger(__name__)
+
+class ResponsePool:
+    """Pre-generated replies for low-entropy commands such as /decree.
+
+    `pop()` is O(1) from an in-process deque. When the pool drops to
+    `low_water` a refill starts straight away; between requests the
+    background loop tops it back up to `target`, but only while `is_quiet()`
+    says the backend has spare capacity. Refills ask `generate_batch(n)` for
+    several replies in one request, and replies matching anything in the
+    pool or among the last `recent` served are dropped.
+    """
+
+    def __init__(
+        self,
+        generate_batch: Callable[[int], Awaitable[List[str]]],
+        target: int = 20,
+        low_water: int = 5,
+        batch_size: int = 5,
+        recent: int = 50,
+        interval: float = 30.0,
+        is_quiet: Callable[[], bool] = lambda: True
+    ):
+        self.generate_batch = generate_batch
+        self.target = target
+        self.low_water = low_water
+        self.batch_size = batch_size
+        self.interval = interval
+        self.is_quiet = is_quiet
+        self._items: Deque[str] = deque()
+        self._pooled: Set[str] = set()
+        self._recent: Deque[str] = deque(maxlen=recent)
+        self._refill: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self.stats = {"served": 0, "empty": 0, "generated": 0, "duplicates": 0, "batches": 0}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def pop(self) -> Optional[str]:
+        """Next pooled reply, or None if the pool is empty (caller generates live)"""
+        if len(self._items) <= self.low_water:
+            self.request_refill()
+        if not self._items:
+            self.stats["empty"] += 1
+            return None
+        item = self._items.popleft()
+        key = normalize_message(item)
+        self._pooled.discard(key)
+        self._recent.append(key)
+        self.stats["served"] += 1
+        return item
+
+    def add(self, replies: List[str]) -> int:
+        """Pool new replies, skipping duplicates; returns how many were kept"""
+        kept = 0
+        for reply in replies:
+            reply = (reply or "").strip()
+            key = normalize_message(reply)
+            if not key or key in self._pooled or key in self._recent:
+                self.stats["duplicates"] += 1
+                continue
+            self._items.append(reply)
+            self._pooled.add(key)
+            kept += 1
+        self.stats["generated"] += kept
+        return kept
+
+    def request_refill(self) -> Optional[asyncio.Task]:
+        """Start a refill unless one is already running (needs a running loop)"""
+        if self._refill is None or self._refill.done():
+            try:
+                self._refill = asyncio.get_running_loop().create_task(self.fill())
+            except RuntimeError:
+                return None
+        return self._refill
+
+    async def fill(self):
+        """Generate batches until the pool reaches `target`"""
+        while len(self._items) < self.target:
+            try:
+                replies = await self.generate_batch(min(self.batch_size, self.target - len(self._items)))
+            except Exception as e:
+                logger.warning("Response pool refill failed: %s", str(e))
+                return
+            self.stats["batches"] += 1
+            if not self.add(replies):
+                # Only duplicates came back; try again on the next tick
+                return
+
+    def start(self) -> asyncio.Task:
+        """Run the background top-up loop on the current event loop"""
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.get_running_loop().create_task(self._run())
+        return self._loop_task
+
+    async def stop(self):
+        for task in (self._loop_task, self._refill):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    async def _run(self):
+        while True:
+            if len(self._items) < self.target and self.is_quiet():
+                await self.request_refill()
+            await asyncio.sleep(self.interval)
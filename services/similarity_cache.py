@@ -0,0 +1,173 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+# Mersenne prime used for the MinHash permutations
+_PRIME = (1 << 61) - 1
+
+def normalize_message(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(_NON_WORD.sub(" ", text.casefold()).split())
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Character n-grams of the normalized text (the whole text if shorter)"""
+    padded = f" {text} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+class MinHasher:
+    """MinHash signatures estimating Jaccard similarity between shingle sets"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        params = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], "big") % (_PRIME - 1) + 1
+            b = int.from_bytes(digest[8:], "big") % _PRIME
+            params.append((a, b))
+        self.params = params
+
+    def signature(self, items: Set[str]) -> Tuple[int, ...]:
+        hashed = [int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "big") for item in items]
+        return tuple(min((a * x + b) % _PRIME for x in hashed) for a, b in self.params)
+
+    @staticmethod
+    def similarity(left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+        return sum(1 for l, r in zip(left, right) if l == r) / len(left)
+
+class SimilarityCache:
+    """User-independent reply cache that also hits on near-duplicate prompts.
+
+    Prompts are normalized, shingled and MinHashed into a local LSH index
+    (`bands` buckets of `num_perm / bands` rows), so "What is your favorite
+    food?" and "whats ur favorite food" can share a reply without any
+    embedding service. Only
+    suitable for stateless prompts: the reply must not depend on who asked
+    or on prior conversation.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        max_entries: int = 2000,
+        ttl: float = 3600,
+        shingle_size: int = 3
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self._entries: "OrderedDict[int, Tuple[str, Tuple[int, ...], dict, float]]" = OrderedDict()
+        self._exact: Dict[str, int] = {}
+        self._buckets: Dict[Tuple, Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0}
+
+    def get(self, message: str, namespace: str = "") -> Optional[Tuple[dict, float]]:
+        """Return `(response, similarity)` for the closest cached prompt, if close enough"""
+        normalized = normalize_message(message)
+        now = time.monotonic()
+        with self._lock:
+            entry_id = self._exact.get(f"{namespace}\0{normalized}")
+            if entry_id is not None and self._fresh(entry_id, now):
+                self._entries.move_to_end(entry_id)
+                self.stats["exact_hits"] += 1
+                return self._entries[entry_id][2], 1.0
+
+        signature = self.hasher.signature(shingles(normalized, self.shingle_size))
+        with self._lock:
+            best_id, best_score = None, 0.0
+            for candidate in self._candidates(namespace, signature):
+                if not self._fresh(candidate, now):
+                    continue
+                score = MinHasher.similarity(signature, self._entries[candidate][1])
+                if score > best_score:
+                    best_id, best_score = candidate, score
+            if best_id is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_id)
+                self.stats["similar_hits"] += 1
+                return self._entries[best_id][2], best_score
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, message: str, response: dict, namespace: str = ""):
+        normalized = normalize_message(message)
+        signature = self.hasher.signature(shingles(normalized, self.shingle_size))
+        exact_key = f"{namespace}\0{normalized}"
+        with self._lock:
+            if exact_key in self._exact:
+                self._remove(self._exact[exact_key])
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (exact_key, signature, response, time.monotonic() + self.ttl)
+            self._exact[exact_key] = entry_id
+            for band in self._bands(namespace, signature):
+                self._buckets.setdefault(band, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _bands(self, namespace: str, signature: Tuple[int, ...]) -> List[Tuple]:
+        return [
+            (namespace, i, signature[i * self.rows:(i + 1) * self.rows])
+            for i in range(self.bands)
+        ]
+
+    def _candidates(self, namespace: str, signature: Tuple[int, ...]) -> Set[int]:
+        found: Set[int] = set()
+        for band in self._bands(namespace, signature):
+            found |= self._buckets.get(band, set())
+        return found
+
+    def _fresh(self, entry_id: int, now: float) -> bool:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return False
+        if entry[3] <= now:
+            self._remove(entry_id)
+            return False
+        return True
+
+    def _remove(self, entry_id: int):
+        exact_key, signature, _, _ = self._entries.pop(entry_id)
+        if self._exact.get(exact_key) == entry_id:
+            del self._exact[exact_key]
+        namespace = exact_key.split("\0", 1)[0]
+        for band in self._bands(namespace, signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band]
+
+_shared: Optional[SimilarityCache] = None
+
+def get_similarity_cache() -> Optional[SimilarityCache]:
+    """Process-wide cache when SIMILARITY_CACHE=true, otherwise None"""
+    global _shared
+    if os.getenv("SIMILARITY_CACHE", "false").lower() != "true":
+        return None
+    if _shared is None:
+        _shared = SimilarityCache(
+            threshold=float(os.getenv("SIMILARITY_THRESHOLD", "0.8")),
+            max_entries=int(os.getenv("SIMILARITY_CACHE_SIZE", "2000")),
+            ttl=float(os.getenv("SIMILARITY_CACHE_TTL", "3600"))
+        )
+    return _shared
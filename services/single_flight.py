@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def normalize_prompt(text: str) -> str:
+    """Case- and whitespace-insensitive form used when comparing prompts"""
+    return " ".join(text.split()).casefold()
+
+def request_key(params: Dict[str, Any]) -> str:
+    """Key identifying completions that can share one model call.
+
+    Built from the normalized messages (system prompt/persona included) and
+    every sampling parameter, so only truly interchangeable requests collapse.
+    """
+    canonical = dict(params)
+    canonical["messages"] = [
+        [m["role"], normalize_prompt(m["content"])] for m in params.get("messages", [])
+    ]
+    digest = hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+    return digest
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one in-flight call.
+
+    Within a process, callers with the same key await the leader's future;
+    if the leader is cancelled, a follower takes over instead of failing.
+    With a `redis.asyncio` client, leaders also take a Redis lock and publish
+    their result under a short-lived key, so callers in other processes can
+    wait for it instead of making their own call.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        lock_ttl: float = 30.0,
+        result_ttl: int = 10,
+        poll_interval: float = 0.05,
+        prefix: str = "singleflight"
+    ):
+        self.redis_client = redis_client
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"calls": 0, "collapsed": 0, "remote_collapsed": 0, "takeovers": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], bool]:
+        """Return `(result, shared)` where `shared` means another caller's call was reused.
+
+        Results must be JSON-serializable when a Redis client is configured.
+        """
+        while True:
+            existing = self._inflight.get(key)
+            if existing is None:
+                break
+            try:
+                result = await asyncio.shield(existing)
+            except asyncio.CancelledError:
+                if not existing.cancelled():
+                    # This caller was cancelled, not the leader
+                    raise
+                # The leader's caller went away; the first follower to wake
+                # leads a new call and the rest follow it
+                self.stats["takeovers"] += 1
+                continue
+            self.stats["collapsed"] += 1
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result, shared = await self._lead(key, fn)
+            future.set_result(result)
+            return result, shared
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Followers get the exception; don't also warn about it being unretrieved
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], bool]:
+        if self.redis_client is None:
+            self.stats["calls"] += 1
+            return await fn(), False
+
+        lock_key, result_key = f"{self.prefix}:lock:{key}", f"{self.prefix}:result:{key}"
+        deadline = time.monotonic() + self.lock_ttl
+        while True:
+            try:
+                cached = await self.redis_client.get(result_key)
+                if cached is not None:
+                    self.stats["remote_collapsed"] += 1
+                    return json.loads(cached), True
+                token = uuid.uuid4().hex
+                acquired = await self.redis_client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+            except Exception as e:
+                logger.warning("Single-flight Redis unavailable, calling directly: %s", str(e))
+                self.stats["calls"] += 1
+                return await fn(), False
+
+            if acquired:
+                return await self._lead_remote(lock_key, result_key, fn), False
+            if time.monotonic() >= deadline:
+                # The remote leader is stuck; don't wait on it forever
+                self.stats["calls"] += 1
+                return await fn(), False
+            await asyncio.sleep(self.poll_interval)
+
+    async def _lead_remote(self, lock_key: str, result_key: str, fn) -> Dict[str, Any]:
+        self.stats["calls"] += 1
+        try:
+            result = await fn()
+            try:
+                await self.redis_client.set(result_key, json.dumps(result), ex=self.result_ttl)
+            except Exception as e:
+                logger.warning("Single-flight result publish failed: %s", str(e))
+            return result
+        finally:
+            try:
+                await self.redis_client.delete(lock_key)
+            except Exception:
+                pass
+
+_shared: Optional[SingleFlight] = None
+
+def get_single_flight() -> SingleFlight:
+    """Process-wide SingleFlight, Redis-backed when SINGLE_FLIGHT_REDIS=true"""
+    global _shared
+    if _shared is None:
+        redis_client = None
+        if os.getenv("SINGLE_FLIGHT_REDIS", "false").lower() == "true":
+            from .redis_pool import get_redis
+            redis_client = get_redis()
+        _shared = SingleFlight(redis_client=redis_client)
+    return _shared
@@ -0,0 +1,113 @@
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Chat-format overhead per message and for priming the reply (OpenAI cookbook)
+TOKENS_PER_MESSAGE = 3
+REPLY_PRIMING_TOKENS = 3
+
+# Rough chars-per-token ratio used when tiktoken isn't installed. This is the
+# intended mode for the Lambda package: tiktoken is a compiled wheel that
+# fetches its BPE files over the network on first use, which costs more cold
+# start than exact counts are worth for budgeting. The input budget leaves
+# enough headroom for the estimate's error; install tiktoken (e.g. for the
+# FastAPI server) to count exactly.
+_FALLBACK_CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """tiktoken encoding for `model`, loaded once per process (None without tiktoken)"""
+    try:
+        import tiktoken
+    except ImportError:
+        logger.info("tiktoken not installed; using a %d chars/token estimate", _FALLBACK_CHARS_PER_TOKEN)
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+class TokenCounter:
+    """Counts and truncates text in model tokens without calling the API"""
+
+    def __init__(self, model: str = "gpt-4o-mini"):
+        self.encoding = _encoding(model)
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return -(-len(text) // _FALLBACK_CHARS_PER_TOKEN)
+
+    def count_message(self, message: Dict[str, str]) -> int:
+        return TOKENS_PER_MESSAGE + self.count(message["content"])
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut `text` to at most `max_tokens` tokens, marking the cut with an ellipsis"""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text)
+            if len(tokens) <= max_tokens:
+                return text
+            return self.encoding.decode(tokens[:max_tokens - 1]) + "…"
+        limit = max_tokens * _FALLBACK_CHARS_PER_TOKEN
+        return text if len(text) <= limit else text[:limit - 1] + "…"
+
+class TokenBudget:
+    """Fits a prompt (system + history + message) into an input token budget.
+
+    The system prompt's cost is computed once. History is taken newest-first
+    (the order MemoryService returns it), each turn capped at
+    `max_turn_tokens`, until the next turn would overflow `input_budget`.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        input_budget: int = 1500,
+        max_turn_tokens: int = 300,
+        model: str = "gpt-4o-mini"
+    ):
+        self.counter = TokenCounter(model)
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.system_tokens = self.counter.count_message(self.system_message)
+        self.input_budget = input_budget
+        self.max_turn_tokens = max_turn_tokens
+        self.stats = {"requests": 0, "prompt_tokens": 0, "last_prompt_tokens": 0, "history_dropped": 0}
+
+    def build(self, message: str, history: Optional[List[Dict[str, str]]] = None) -> Tuple[List[Dict[str, str]], int]:
+        """Return `(messages, prompt_tokens)` ready for chat.completions"""
+        fixed = self.system_tokens + REPLY_PRIMING_TOKENS + TOKENS_PER_MESSAGE
+        # The user's own message always goes in, truncated only if it alone busts the budget
+        message = self.counter.truncate(message, max(self.input_budget - fixed, 1))
+        used = fixed + self.counter.count(message)
+
+        kept: List[Dict[str, str]] = []
+        history = history or []
+        for turn in history:
+            content = self.counter.truncate(turn["content"], self.max_turn_tokens)
+            cost = TOKENS_PER_MESSAGE + self.counter.count(content)
+            if used + cost > self.input_budget:
+                break
+            kept.append({"role": turn["role"], "content": content})
+            used += cost
+
+        self.stats["requests"] += 1
+        self.stats["prompt_tokens"] += used
+        self.stats["last_prompt_tokens"] = used
+        self.stats["history_dropped"] += len(history) - len(kept)
+
+        kept.reverse()
+        return [self.system_message, *kept, {"role": "user", "content": message}], used
+
+def budget_from_env(system_prompt: str, model: str = "gpt-4o-mini") -> TokenBudget:
+    """TokenBudget sized by CHAT_INPUT_TOKEN_BUDGET / CHAT_MAX_TURN_TOKENS"""
+    return TokenBudget(
+        system_prompt,
+        input_budget=int(os.getenv("CHAT_INPUT_TOKEN_BUDGET", 1500)),
+        max_turn_tokens=int(os.getenv("CHAT_MAX_TURN_TOKENS", 300)),
+        model=model
+    )
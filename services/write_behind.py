@@ -0,0 +1,173 @@
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# DynamoDB's BatchWriteItem limit
+MAX_BATCH = 25
+
+# Error codes worth retrying; anything else (validation, missing table,
+# access denied) fails the same way every time
+RETRYABLE_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "InternalServerError",
+    "ServiceUnavailable",
+}
+
+def _retryable(error: Exception) -> bool:
+    """Throttling, 5xx and connection errors are transient; the rest are not"""
+    code = (getattr(error, "response", None) or {}).get("Error", {}).get("Code")
+    if code is not None:
+        return code in RETRYABLE_CODES
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        # botocore is only needed once a write has actually failed
+        from botocore.exceptions import ConnectionError as BotoConnectionError, HTTPClientError
+    except ImportError:
+        return False
+    return isinstance(error, (BotoConnectionError, HTTPClientError))
+
+class WriteBehindBuffer:
+    """Buffers DynamoDB puts and writes them with BatchWriteItem.
+
+    `add()` only appends to memory. A daemon thread flushes when `max_batch`
+    items are waiting or `flush_interval` seconds have passed, in chunks of
+    up to 25. UnprocessedItems and throttling/transient errors are retried
+    with full-jitter exponential backoff; other errors drop the chunk at once. `flush()` drains synchronously; call it
+    at shutdown and at the end of every Lambda invocation, since a frozen
+    container never runs the background thread.
+    """
+
+    def __init__(
+        self,
+        dynamodb,
+        table_name: str,
+        key_fields: Sequence[str] = ("user_id", "timestamp"),
+        max_batch: int = MAX_BATCH,
+        flush_interval: float = 1.0,
+        max_retries: int = 5,
+        base_delay: float = 0.05,
+        max_delay: float = 2.0,
+        rng: Callable[[], float] = random.random,
+        sleep: Callable[[float], None] = time.sleep,
+        background: bool = True
+    ):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.key_fields = tuple(key_fields)
+        self.max_batch = min(max_batch, MAX_BATCH)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng
+        self.sleep = sleep
+        self._items: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # Serializes flushes so the thread and an explicit drain don't interleave
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"added": 0, "written": 0, "batches": 0, "retries": 0, "failed": 0}
+        if background:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item: Dict[str, Any]):
+        with self._lock:
+            self._items.append(item)
+            self.stats["added"] += 1
+            full = len(self._items) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything buffered so far, blocking until done"""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    chunk, self._items = self._items[:self.max_batch], self._items[self.max_batch:]
+                if not chunk:
+                    return
+                self._write(chunk)
+
+    def close(self):
+        """Stop the background thread and drain the buffer"""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Write-behind flush failed: %s", str(e))
+
+    def _dedupe(self, chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # BatchWriteItem rejects two puts for the same key in one request; last write wins
+        by_key = {tuple(item.get(field) for field in self.key_fields): item for item in chunk}
+        return list(by_key.values())
+
+    def _write(self, chunk: List[Dict[str, Any]]):
+        requests = [{"PutRequest": {"Item": item}} for item in self._dedupe(chunk)]
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                self.sleep(self.rng() * min(self.max_delay, self.base_delay * 2 ** attempt))
+            try:
+                response = self.dynamodb.batch_write_item(RequestItems={self.table_name: requests})
+            except Exception as e:
+                if not _retryable(e):
+                    self.stats["failed"] += len(requests)
+                    logger.error("Dropping %d interactions, BatchWriteItem failed: %s", len(requests), str(e))
+                    return
+                # Throttling and transient errors: retry the whole chunk
+                logger.warning("BatchWriteItem failed (attempt %d): %s", attempt + 1, str(e))
+                continue
+            self.stats["batches"] += 1
+            unprocessed = (response.get("UnprocessedItems") or {}).get(self.table_name, [])
+            self.stats["written"] += len(requests) - len(unprocessed)
+            if not unprocessed:
+                return
+            requests = unprocessed
+        self.stats["failed"] += len(requests)
+        logger.error("Dropping %d interactions after %d BatchWriteItem attempts", len(requests), self.max_retries + 1)
+
+_shared: Optional[WriteBehindBuffer] = None
+_shared_lock = threading.Lock()
+
+def get_write_behind(table_name: str = None) -> WriteBehindBuffer:
+    """Process-wide buffer for DYNAMODB_TABLE, drained at interpreter exit"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            import boto3
+            _shared = WriteBehindBuffer(
+                boto3.resource('dynamodb'),
+                table_name or os.getenv("DYNAMODB_TABLE"),
+                flush_interval=float(os.getenv("WRITE_BEHIND_INTERVAL", 1.0))
+            )
+            atexit.register(_shared.close)
+        return _shared
+
+def drain_write_behind():
+    """Flush the shared buffer if one was created (cheap no-op otherwise)"""
+    if _shared is not None:
+        _shared.flush()
@@ -0,0 +1,185 @@
+import fnmatch
+import json
+
+import pytest
+
+from services.redis_pool import RELEASE_LOCK
+
+
+def _release_lock(redis, keys, args):
+    return FakeRedis.delete(redis, keys[0]) if redis.data.get(keys[0]) == args[0] else 0
+
+
+# Python equivalents of the Lua scripts the services EVAL
+SCRIPTS = {RELEASE_LOCK: _release_lock}
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.Redis commands the services use.
+
+    Strings, lists and sets live in plain dicts (with TTLs in seconds) so
+    tests can inspect and seed them. Replies are bytes unless
+    `decode_responses` is set, as with the real client.
+    """
+
+    def __init__(self, decode_responses=False):
+        self.decode_responses = decode_responses
+        self.data = {}
+        self.lists = {}
+        self.sets = {}
+        self.ttls = {}
+        self.published = []
+        self.round_trips = 0
+        self.transactions = 0
+
+    def _reply(self, value):
+        if value is None or self.decode_responses or not isinstance(value, str):
+            return value
+        return value.encode()
+
+    def get(self, key):
+        return self._reply(self.data.get(key))
+
+    def set(self, key, value, nx=False, ex=None, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        self.ttls[key] = ex if px is None else px / 1000
+        return True
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+        self.ttls[key] = ttl
+        return True
+
+    def pttl(self, key):
+        if key not in self.data:
+            return -2
+        ttl = self.ttls.get(key)
+        return -1 if ttl is None else ttl * 1000
+
+    def expire(self, key, ttl, nx=False, gt=False):
+        current = self.ttls.get(key)
+        if (nx and current is not None) or (gt and (current is None or ttl <= current)):
+            return False
+        self.ttls[key] = ttl
+        return True
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            found = False
+            for store in (self.data, self.lists, self.sets):
+                found = store.pop(key, None) is not None or found
+            self.ttls.pop(key, None)
+            removed += found
+        return removed
+
+    def sadd(self, key, *members):
+        current = self.sets.setdefault(key, set())
+        added = len(set(members) - current)
+        current.update(members)
+        return added
+
+    def srem(self, key, *members):
+        current = self.sets.get(key, set())
+        removed = len(current & set(members))
+        current.difference_update(members)
+        # Redis deletes a set when its last member goes
+        if not current:
+            self.sets.pop(key, None)
+        return removed
+
+    def lpush(self, key, *values):
+        items = self.lists.setdefault(key, [])
+        for value in values:
+            items.insert(0, value)
+        return len(items)
+
+    def ltrim(self, key, start, end):
+        items = self.lists.get(key, [])
+        self.lists[key] = items[start:None if end == -1 else end + 1]
+        return True
+
+    def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return [self._reply(value) for value in items[start:None if end == -1 else end + 1]]
+
+    def publish(self, channel, message):
+        self.published.append(json.loads(message))
+        return 0
+
+    def eval(self, script, numkeys, *keys_and_args):
+        return SCRIPTS[script](self, keys_and_args[:numkeys], keys_and_args[numkeys:])
+
+
+class FakePipeline:
+    """Queues commands and runs them as one round-trip on execute()"""
+
+    def __init__(self, redis, transaction):
+        self.redis = redis
+        self.transaction = transaction
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        results = [getattr(FakeRedis, name)(self.redis, *args, **kwargs) for name, args, kwargs in self.calls]
+        self.redis.round_trips += 1
+        self.redis.transactions += self.transaction
+        self.calls = []
+        return results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _command(name):
+    sync = getattr(FakeRedis, name)
+
+    async def command(self, *args, **kwargs):
+        self.round_trips += 1
+        return sync(self, *args, **kwargs)
+
+    command.__name__ = name
+    return command
+
+
+class FakeAsyncRedis(FakeRedis):
+    """redis.asyncio flavour: the same commands as coroutines, plus pipelines.
+
+    Every command or pipeline counts one round-trip; scans are not counted.
+    """
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self, transaction)
+
+    async def sscan_iter(self, key, count=None):
+        for member in list(self.sets.get(key, ())):
+            yield self._reply(member)
+
+    async def scan_iter(self, match=None, count=None):
+        for key in list(self.data) + list(self.lists) + list(self.sets):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield self._reply(key)
+
+
+for _name in ("get", "set", "setex", "pttl", "expire", "delete", "sadd", "srem", "lpush", "ltrim", "lrange", "publish", "eval"):
+    setattr(FakeAsyncRedis, _name, _command(_name))
+
+
+@pytest.fixture
+def redis_client():
+    return FakeAsyncRedis()
+
+
+@pytest.fixture
+def sync_redis_client():
+    """Synchronous client as the Lambda builds it (decode_responses=True)"""
+    return FakeRedis(decode_responses=True)
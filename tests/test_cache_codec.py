@@ -0,0 +1,53 @@
+import json
+import pytest
+
+from services.cache_codec import JSON, JSON_ZLIB, MSGPACK, MSGPACK_AVAILABLE, CacheCodec
+
+
+def test_json_round_trip_with_version_byte():
+    codec = CacheCodec("json")
+    data = codec.encode({"response": "purr", "n": 1})
+
+    assert data[0] == JSON
+    assert CacheCodec.decode(data) == {"response": "purr", "n": 1}
+
+
+def test_large_values_are_compressed():
+    codec = CacheCodec("json", compress_threshold=100)
+    value = {"response": "meow " * 200}
+    data = codec.encode(value)
+
+    assert data[0] == JSON_ZLIB
+    assert len(data) < len(json.dumps(value))
+    assert CacheCodec.decode(data) == value
+
+
+def test_incompressible_values_stay_uncompressed():
+    codec = CacheCodec("json", compress_threshold=10)
+    data = codec.encode({"r": "x7Qp"})
+    assert data[0] == JSON
+
+
+def test_legacy_json_text_is_still_readable():
+    assert CacheCodec.decode(b'{"response": "old"}') == {"response": "old"}
+    assert CacheCodec.decode('{"response": "old"}') == {"response": "old"}
+
+
+def test_corrupt_compressed_entry_raises_value_error():
+    with pytest.raises(ValueError):
+        CacheCodec.decode(bytes((JSON_ZLIB,)) + b"not zlib")
+
+
+@pytest.mark.skipif(not MSGPACK_AVAILABLE, reason="msgpack not installed")
+def test_msgpack_round_trip_and_json_entries_readable():
+    codec = CacheCodec("msgpack")
+    data = codec.encode({"response": "purr"})
+
+    assert data[0] == MSGPACK
+    assert CacheCodec.decode(data) == {"response": "purr"}
+    assert CacheCodec.decode(CacheCodec("json").encode({"a": 1})) == {"a": 1}
+
+
+@pytest.mark.skipif(MSGPACK_AVAILABLE, reason="msgpack installed")
+def test_falls_back_to_json_without_msgpack():
+    assert CacheCodec("msgpack").format == JSON
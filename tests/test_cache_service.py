@@ -0,0 +1,216 @@
+import asyncio
+import json
+import time
+import pytest
+
+from services.cache_service import CacheService, tag_key
+
+
+@pytest.fixture
+def cache(redis_client, monkeypatch):
+    monkeypatch.setenv("CACHE_L1", "false")
+    return CacheService(redis_client)
+
+
+@pytest.mark.asyncio
+async def test_round_trip_through_redis(cache):
+    await cache.cache_response("u1", "hi", "discord", {"response": "purr"})
+
+    assert await cache.get_cached_response("u1", "hi", "discord") == {"response": "purr"}
+    assert await cache.get_cached_response("u1", "bye", "discord") is None
+    assert cache.stats == {"l1_hits": 0, "l2_hits": 1, "misses": 1}
+
+
+@pytest.mark.asyncio
+async def test_write_registers_tags_in_one_round_trip(cache, redis_client):
+    await cache.cache_response("u1", "hi", "discord", {"response": "purr"})
+
+    assert redis_client.round_trips == 1
+    for tag in ("user:u1", "platform:discord", "persona:1"):
+        assert len(redis_client.sets[tag_key(tag)]) == 1
+        assert redis_client.ttls[tag_key(tag)] == 3600 + cache.stale_ttl
+
+
+@pytest.mark.asyncio
+async def test_invalidate_tag_deletes_only_its_members(cache, redis_client):
+    await cache.cache_response("u1", "hi", "discord", {"response": "a"})
+    await cache.cache_response("u1", "bye", "web", {"response": "b"})
+    await cache.cache_response("u2", "hi", "discord", {"response": "c"})
+
+    assert await cache.invalidate_tags("user:u1") == 2
+
+    assert await cache.get_cached_response("u1", "hi", "discord") is None
+    assert await cache.get_cached_response("u2", "hi", "discord") == {"response": "c"}
+    assert tag_key("user:u1") not in redis_client.sets
+
+
+@pytest.mark.asyncio
+async def test_invalidate_tag_deletes_in_batches(cache, redis_client, monkeypatch):
+    monkeypatch.setattr("services.cache_service.INVALIDATION_BATCH", 2)
+    for i in range(5):
+        await cache.cache_response("u1", f"m{i}", "discord", {"response": str(i)})
+    redis_client.round_trips = 0
+
+    assert await cache.invalidate_tags("user:u1") == 5
+
+    assert redis_client.round_trips == 3
+    assert tag_key("user:u1") not in redis_client.sets
+
+
+@pytest.mark.asyncio
+async def test_write_during_invalidation_keeps_its_tag(cache, redis_client):
+    await cache.cache_response("u1", "old", "discord", {"response": "a"})
+    scan = redis_client.sscan_iter
+
+    async def sscan_with_concurrent_write(key, count=None):
+        async for member in scan(key, count):
+            yield member
+            # Another request caches a fresh reply mid-scan
+            await cache.cache_response("u1", "new", "discord", {"response": "b"})
+
+    redis_client.sscan_iter = sscan_with_concurrent_write
+    assert await cache.invalidate_tags("user:u1") == 1
+
+    assert await cache.get_cached_response("u1", "new", "discord") == {"response": "b"}
+    assert redis_client.sets[tag_key("user:u1")] == {cache._chat_key("u1", "new", "discord")}
+    redis_client.sscan_iter = scan
+    assert await cache.invalidate_tags("user:u1") == 1
+    assert await cache.get_cached_response("u1", "new", "discord") is None
+
+
+@pytest.mark.asyncio
+async def test_pattern_invalidation_uses_scan(cache, redis_client):
+    await cache.cache_response("u1", "hi", "discord", {"response": "a"})
+    await cache.invalidate_cache("chat:")
+    assert await cache.get_cached_response("u1", "hi", "discord") is None
+
+
+@pytest.mark.asyncio
+async def test_l1_serves_repeat_reads_without_redis(redis_client, monkeypatch):
+    monkeypatch.setenv("CACHE_L1", "true")
+    cache = CacheService(redis_client)
+    cache._ensure_listener = lambda: None
+    writer = CacheService(redis_client)
+    writer._ensure_listener = lambda: None
+    await writer.cache_response("u1", "hi", "discord", {"response": "purr"})
+
+    first = await cache.get_cached_response("u1", "hi", "discord")
+    trips = redis_client.round_trips
+    second = await cache.get_cached_response("u1", "hi", "discord")
+
+    assert first == second == {"response": "purr"}
+    assert redis_client.round_trips == trips
+    assert cache.cache_stats()["l1_hits"] == 1
+    assert cache.cache_stats()["l2_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_l1_drops_keys_invalidated_by_other_processes(redis_client, monkeypatch):
+    monkeypatch.setenv("CACHE_L1", "true")
+    reader, writer = CacheService(redis_client), CacheService(redis_client)
+    for service in (reader, writer):
+        service._ensure_listener = lambda: None
+    await writer.cache_response("u1", "hi", "discord", {"response": "old"})
+    await reader.get_cached_response("u1", "hi", "discord")
+
+    await writer.cache_response("u1", "hi", "discord", {"response": "new"})
+    reader._on_invalidation({"data": json.dumps(redis_client.published[-1])})
+
+    assert await reader.get_cached_response("u1", "hi", "discord") == {"response": "new"}
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_computes_once_on_miss(cache):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"response": "purr"}
+
+    assert await cache.get_or_compute("u1", "hi", "discord", compute) == {"response": "purr"}
+    assert await cache.get_or_compute("u1", "hi", "discord", compute) == {"response": "purr"}
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_served_while_one_refresh_runs(cache, redis_client):
+    await cache.cache_response("u1", "hi", "discord", {"response": "old"}, ttl=60)
+    key = cache._chat_key("u1", "hi", "discord")
+    entry = cache.codec.decode(redis_client.data[key])
+    entry["soft_expiry"] = time.time() - 1
+    redis_client.data[key] = cache.codec.encode(entry)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"response": "new"}
+
+    results = await asyncio.gather(*[
+        cache.get_or_compute("u1", "hi", "discord", compute) for _ in range(5)
+    ])
+    await asyncio.sleep(0.05)
+
+    assert all(result == {"response": "old"} for result in results)
+    assert len(calls) == 1
+    assert await cache.get_cached_response("u1", "hi", "discord") == {"response": "new"}
+    assert cache.refresh_stats["refreshes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_refresh_does_not_release_a_lock_it_no_longer_holds(cache, redis_client):
+    await cache.cache_response("u1", "hi", "discord", {"response": "old"})
+    key = cache._chat_key("u1", "hi", "discord")
+    lock_key = f"refresh:{key}"
+
+    async def compute():
+        # Our lock expired mid-compute and another process took it
+        redis_client.data[lock_key] = "other-instance"
+        return {"response": "new"}
+
+    await cache._refresh(key, "u1", "hi", "discord", compute, None)
+
+    assert redis_client.data[lock_key] == "other-instance"
+    assert cache.refresh_stats["refreshes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_releases_its_own_lock(cache, redis_client):
+    await cache.cache_response("u1", "hi", "discord", {"response": "old"})
+    key = cache._chat_key("u1", "hi", "discord")
+
+    async def compute():
+        return {"response": "new"}
+
+    await cache._refresh(key, "u1", "hi", "discord", compute, None)
+
+    assert f"refresh:{key}" not in redis_client.data
+
+
+def test_xfetch_refreshes_earlier_for_slow_recomputes(cache):
+    now = 1000.0
+    entry = {"soft_expiry": now + 5, "delta": 1.0}
+    cache.rng = lambda: 0.01  # -ln(0.01) ~ 4.6
+
+    assert not cache._should_refresh(entry, now)
+    assert cache._should_refresh(dict(entry, delta=2.0), now)
+    assert cache._should_refresh(dict(entry, soft_expiry=now - 1), now)
+
+
+@pytest.mark.asyncio
+async def test_entries_without_soft_expiry_are_still_read(cache, redis_client):
+    key = cache._chat_key("u1", "hi", "discord")
+    redis_client.data[key] = json.dumps({"response": "legacy"})
+    assert await cache.get_cached_response("u1", "hi", "discord") == {"response": "legacy"}
+
+
+@pytest.mark.asyncio
+async def test_keys_depend_on_every_field(cache):
+    keys = {
+        cache._chat_key("u1", "hi", "discord"),
+        cache._chat_key("u2", "hi", "discord"),
+        cache._chat_key("u1", "hi", "web"),
+        cache._chat_key("u1", "hey", "discord"),
+    }
+    assert len(keys) == 4
+    assert cache._chat_key("u1", "hi", "discord").startswith("chat:")
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+import pytest
+from types import SimpleNamespace
+
+pytest.importorskip("openai")
+
+from services.canned_replies import GREETING_REPLIES, SLOW_REPLIES
+from services.chat_service import ChatService, run_sync
+from services.model_router import FAST, ModelRouter
+from services.request_log import RequestLog
+from services.similarity_cache import SimilarityCache
+from services.resilience import AdaptiveLimiter, BackendGuard, CircuitBreaker
+
+
+class FakeCompletions:
+    """Async stand-in for client.chat.completions with a fixed latency"""
+
+    def __init__(self, delay=0.1, content="purr"):
+        self.delay = delay
+        self.content = content
+        self.calls = []
+
+    async def create(self, **params):
+        self.calls.append(params)
+        await asyncio.sleep(self.delay)
+        if params.get("stream"):
+            return self._chunks()
+        message = SimpleNamespace(content=self.content)
+        usage = SimpleNamespace(prompt_tokens=50, completion_tokens=len(self.content.split()))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    async def _chunks(self):
+        for word in self.content.split(" "):
+            delta = SimpleNamespace(content=word + " ")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+@pytest.fixture
+def chat_service(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    service = ChatService()
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+    return service
+
+
+@pytest.mark.asyncio
+async def test_concurrent_chats_overlap(chat_service):
+    """Ten 100ms completions finish together instead of one after another"""
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        chat_service.generate_response(user_id=str(i), message="hi") for i in range(10)
+    ])
+    elapsed = time.perf_counter() - start
+
+    assert all(result["response"] == "purr" for result in results)
+    assert elapsed < 0.5
+
+
+def test_sync_facade(chat_service):
+    result = chat_service.generate_response_sync(user_id="1", message="hi", timeout=5)
+    assert result["response"] == "purr"
+    assert result["prompt_tokens"] > 0
+
+
+def test_stream_yields_deltas_in_order(chat_service):
+    chat_service.client.chat.completions.content = "slow down human"
+    deltas = list(chat_service.stream_response_sync(user_id="1", message="hi", timeout=5))
+    assert deltas == ["slow ", "down ", "human "]
+
+
+def test_deadline_returns_canned_reply(chat_service):
+    chat_service.client.chat.completions.delay = 0.5
+    result = chat_service.generate_response_sync(user_id="1", message="hi", timeout=5, deadline=0.05)
+    assert result["fallback"] is True
+    assert result["response"] in SLOW_REPLIES
+
+
+def test_stream_deadline_before_first_token_yields_canned_reply(chat_service):
+    chat_service.client.chat.completions.delay = 0.5
+    deltas = list(chat_service.stream_response_sync(user_id="1", message="hi", timeout=5, deadline=0.05))
+    assert len(deltas) == 1
+    assert deltas[0] in SLOW_REPLIES
+
+
+def test_similarity_hit_reports_prompt_tokens(chat_service):
+    chat_service.similarity_cache = SimilarityCache()
+    first = chat_service.generate_response_sync(user_id="1", message="what is your favorite food?", timeout=5)
+    second = chat_service.generate_response_sync(user_id="2", message="What is your favorite food?", timeout=5)
+
+    assert len(chat_service.client.chat.completions.calls) == 1
+    assert first["prompt_tokens"] > 0
+    assert second == {"response": "purr", "prompt_tokens": 0}
+
+
+async def _logged(call):
+    """Run `call` inside its own request record; returns (result, logged fields)"""
+    record = RequestLog(logging.getLogger("test")).start()
+    try:
+        return await call(), record.fields
+    finally:
+        record.emit()
+
+
+@pytest.mark.asyncio
+async def test_prompt_tokens_are_logged_only_for_the_caller_that_sent_them(chat_service):
+    chat_service.similarity_cache = SimilarityCache()
+    leader, follower = await asyncio.gather(
+        _logged(lambda: chat_service.generate_response(user_id="1", message="tell me a secret")),
+        _logged(lambda: chat_service.generate_response(user_id="2", message="tell me a secret"))
+    )
+    cached = await _logged(lambda: chat_service.generate_response(user_id="3", message="tell me a secret"))
+
+    assert leader[1]["prompt_tokens"] == leader[0]["prompt_tokens"] > 0
+    assert follower[1]["prompt_tokens"] == follower[0]["prompt_tokens"] == 0
+    assert follower[1]["coalesced"] is True
+    assert cached[1]["prompt_tokens"] == cached[0]["prompt_tokens"] == 0
+
+
+def test_canned_replies_cycle_without_repeats(chat_service):
+    drawn = [chat_service._fallback("deadline")["response"] for _ in SLOW_REPLIES]
+    assert sorted(drawn) == sorted(SLOW_REPLIES)
+
+
+def test_open_circuit_returns_canned_reply(chat_service):
+    chat_service.backend = BackendGuard(AdaptiveLimiter(), CircuitBreaker(failure_threshold=1))
+    chat_service.backend.breaker.record_failure()
+
+    result = chat_service.generate_response_sync(user_id="1", message="anyone home?", timeout=5)
+
+    assert result["fallback"] is True
+    assert chat_service.client.chat.completions.calls == []
+
+
+def test_routed_greeting_never_calls_the_model(chat_service):
+    chat_service.router = ModelRouter()
+    result = chat_service.generate_response_sync(user_id="1", message="hey", timeout=5)
+
+    assert result["response"] in GREETING_REPLIES
+    assert chat_service.client.chat.completions.calls == []
+
+
+def test_routed_chit_chat_uses_small_budget(chat_service):
+    chat_service.router = ModelRouter()
+    chat_service.generate_response_sync(user_id="1", message="do you like pigeons", timeout=5)
+
+    assert chat_service.client.chat.completions.calls[0]["max_tokens"] == FAST.max_tokens
+    assert chat_service.router.stats["fast"]["prompt_tokens"] == 50
+    assert chat_service.router.stats["fast"]["completion_tokens"] == 1
+
+
+def test_generate_batch_asks_for_n_choices(chat_service):
+    choices = [SimpleNamespace(message=SimpleNamespace(content=f"Decree {i}")) for i in range(3)]
+
+    async def create(**params):
+        chat_service.client.chat.completions.calls.append(params)
+        return SimpleNamespace(choices=choices)
+
+    chat_service.client.chat.completions.create = create
+    result = run_sync(chat_service.generate_batch("Issue a royal decree!", 3), 5)
+
+    assert result == ["Decree 0", "Decree 1", "Decree 2"]
+    assert chat_service.client.chat.completions.calls[0]["n"] == 3
+    assert chat_service.response_pool("decree", "x") is chat_service.response_pool("decree", "x")
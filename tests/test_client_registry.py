@@ -0,0 +1,36 @@
+from unittest.mock import Mock
+
+from services.client_registry import ClientRegistry
+
+
+def test_client_is_built_once_and_reused():
+    """Warm invocations get the same client instance"""
+    registry = ClientRegistry()
+    factory = Mock(side_effect=lambda: object())
+
+    first = registry.get("openai", factory, fingerprint="key-1")
+    assert registry.last_reused("openai") is False
+    second = registry.get("openai", factory, fingerprint="key-1")
+
+    assert first is second
+    assert factory.call_count == 1
+    assert registry.last_reused("openai") is True
+    assert registry.stats()["openai"]["reused"] == 1
+
+
+def test_config_change_rebuilds_and_closes_old_client():
+    """A new fingerprint replaces the client and closes the stale one"""
+    registry = ClientRegistry()
+    old = registry.get("openai", Mock, fingerprint="key-1")
+    new = registry.get("openai", Mock, fingerprint="key-2")
+
+    assert new is not old
+    old.close.assert_called_once()
+    assert registry.stats()["openai"]["built"] == 2
+
+
+def test_factory_can_build_its_dependencies():
+    registry = ClientRegistry()
+    outer = registry.get("outer", lambda: ("outer", registry.get("inner", lambda: "inner")))
+    assert outer == ("outer", "inner")
+    assert registry.peek("inner") == "inner"
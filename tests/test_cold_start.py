@@ -0,0 +1,30 @@
+import os
+
+from scripts.import_report import PING_SNIPPET, import_time_report
+
+# Import budget for a cold PING, in milliseconds (CI boxes can raise it)
+BUDGET_MS = float(os.environ.get("COLD_START_BUDGET_MS", "150"))
+
+HEAVY_PACKAGES = ("boto3", "botocore", "openai", "httpx")
+
+DECREE_SNIPPET = (
+    "import json, lambda_function; "
+    "lambda_function.verify_signature = lambda event, body: True; "
+    "lambda_function.lambda_handler({'headers': {}, "
+    "'body': json.dumps({'type': 2, 'data': {'name': 'decree'}})}, None)"
+)
+
+
+def test_ping_cold_start_within_budget():
+    """A cold PING stays under the import budget"""
+    report = import_time_report(PING_SNIPPET)
+    total = sum(report.values())
+    assert total < BUDGET_MS, f"cold PING imports took {total:.1f}ms: {report}"
+
+
+def test_ping_and_decree_skip_heavy_dependencies():
+    """Neither PING nor /decree loads boto3 or openai"""
+    for snippet in (PING_SNIPPET, DECREE_SNIPPET):
+        report = import_time_report(snippet)
+        loaded = [pkg for pkg in HEAVY_PACKAGES if pkg in report]
+        assert not loaded, f"heavy packages imported: {loaded}"
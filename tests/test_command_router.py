@@ -0,0 +1,67 @@
+import json
+import logging
+import random
+
+from services.command_router import CommandRouter, ShuffleBag, message_envelope
+from services.request_log import RequestLog
+
+
+def _router():
+    return CommandRouter(unknown_content="unknown", error_content="oops")
+
+
+def test_shuffle_bag_never_repeats_within_or_across_cycles():
+    bag = ShuffleBag(["a", "b", "c", "d"], rng=random.Random(7))
+    draws = [bag.next() for _ in range(40)]
+
+    for start in range(0, 40, 4):
+        assert sorted(draws[start:start + 4]) == ["a", "b", "c", "d"]
+    assert all(prev != cur for prev, cur in zip(draws, draws[1:]))
+
+
+def test_static_response_is_serialized_once():
+    router = _router()
+    router.static("ping", "pong")
+    body = {"data": {"name": "ping"}}
+
+    assert router.dispatch(body) is router.dispatch(body)
+    assert json.loads(router.dispatch(body)) == message_envelope("pong")
+
+
+def test_generated_errors_use_command_fallback_and_are_counted():
+    router = _router()
+
+    @router.generated("chat", error_content="chat broke")
+    def chat(body):
+        raise RuntimeError("model down")
+
+    response = json.loads(router.dispatch({"data": {"name": "chat"}}))
+
+    assert response["data"]["content"] == "chat broke"
+    assert router.stats()["chat"]["errors"] == 1
+    assert router.dispatch_result({"data": {"name": "chat"}})[1] is False
+
+
+def test_dispatch_annotates_the_request_record():
+    router = _router()
+    router.static("ping", "pong")
+
+    @router.generated("chat")
+    def chat(body):
+        raise RuntimeError("model down")
+
+    for name, failed in (("ping", False), ("chat", True)):
+        record = RequestLog(logging.getLogger("test")).start()
+        router.dispatch({"data": {"name": name}})
+        record.emit()
+
+        assert record.fields["command"] == name
+        assert record.fields["command_error"] is failed
+        assert record.fields["command_ms"] >= 0
+
+
+def test_unknown_command():
+    router = _router()
+    response = json.loads(router.dispatch({"data": {"name": "nope"}}))
+    assert response["data"]["content"] == "unknown"
+    assert router.stats()["<unknown>"]["calls"] == 1
@@ -0,0 +1,125 @@
+import json
+import pytest
+from unittest.mock import Mock
+
+import lambda_function
+
+
+def _chat_event(message="Hello"):
+    return {
+        "headers": {
+            "x-signature-ed25519": "signature",
+            "x-signature-timestamp": "timestamp"
+        },
+        "body": json.dumps({
+            "type": 2,
+            "application_id": "app-123",
+            "token": "interaction-token",
+            "data": {
+                "name": "chat",
+                "options": [{"value": message}]
+            },
+            "member": {"user": {"id": "123"}}
+        })
+    }
+
+
+@pytest.fixture
+def deferred(monkeypatch):
+    monkeypatch.setattr(lambda_function, "CHAT_RESPONSE_MODE", "deferred")
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "cremeai-bot-dev-bot")
+    monkeypatch.setattr(lambda_function, "verify_signature", lambda event, body: True)
+    client = Mock()
+    monkeypatch.setattr(lambda_function, "_get_lambda_client", lambda: client)
+    return client
+
+
+def test_chat_is_acknowledged_with_deferred_type(deferred, monkeypatch):
+    """/chat returns type 5 without generating a reply inline"""
+    generate = Mock()
+    monkeypatch.setattr(lambda_function, "_generate_chat_reply", generate)
+
+    response = lambda_handler_body(_chat_event())
+
+    assert response == {"type": 5}
+    generate.assert_not_called()
+    kwargs = deferred.invoke.call_args.kwargs
+    assert kwargs["InvocationType"] == "Event"
+    payload = json.loads(kwargs["Payload"])
+    assert payload[lambda_function.FOLLOWUP_EVENT_KEY] == {
+        "application_id": "app-123",
+        "token": "interaction-token",
+        "message": "Hello"
+    }
+
+
+def test_dispatch_failure_falls_back_to_sync_reply(deferred, monkeypatch):
+    """If the self-invoke fails the reply is generated inline"""
+    deferred.invoke.side_effect = Exception("throttled")
+    monkeypatch.setattr(lambda_function, "_generate_chat_reply", lambda msg, deadline=None: "purr")
+
+    response = lambda_handler_body(_chat_event())
+
+    assert response == {"type": 4, "data": {"content": "purr"}}
+
+
+def test_followup_patches_original_message(monkeypatch):
+    """The follow-up invocation edits @original with the generated reply"""
+    monkeypatch.setattr(lambda_function, "CHAT_STREAMING", False)
+    monkeypatch.setattr(lambda_function, "_generate_chat_reply", lambda msg, deadline=None: f"re: {msg}")
+    edit = Mock()
+    monkeypatch.setattr(lambda_function, "_edit_original_response", edit)
+
+    result = lambda_function.lambda_handler({
+        lambda_function.FOLLOWUP_EVENT_KEY: {
+            "application_id": "app-123",
+            "token": "interaction-token",
+            "message": "Hello"
+        }
+    }, None)
+
+    assert result["statusCode"] == 200
+    edit.assert_called_once_with("app-123", "interaction-token", "re: Hello")
+
+
+def test_streamed_followup_edits_progressively(monkeypatch):
+    """Streaming edits the message as chunks arrive and always sends the final text"""
+    monkeypatch.setattr(lambda_function, "CHAT_STREAMING", True)
+    monkeypatch.setattr(lambda_function, "STREAM_EDIT_INTERVAL", 0.0)
+    service = Mock()
+    service.stream_response_sync.return_value = iter(["Meow", ", ", "human."])
+    monkeypatch.setattr(lambda_function, "_get_chat_service", lambda: service)
+    edit = Mock()
+    monkeypatch.setattr(lambda_function, "_edit_original_response", edit)
+
+    result = lambda_function.handle_followup({
+        "application_id": "app-123", "token": "interaction-token", "message": "hi"
+    })
+
+    assert result["statusCode"] == 200
+    contents = [c.args[2] for c in edit.call_args_list]
+    assert contents[0] == "Meow"
+    assert contents[-1] == "Meow, human."
+
+
+def test_streamed_followup_sends_first_chunk_without_waiting(monkeypatch):
+    monkeypatch.setattr(lambda_function, "CHAT_STREAMING", True)
+    monkeypatch.setattr(lambda_function, "STREAM_EDIT_INTERVAL", 60.0)
+    service = Mock()
+    service.stream_response_sync.return_value = iter(["Meow", ", ", "human."])
+    monkeypatch.setattr(lambda_function, "_get_chat_service", lambda: service)
+    edit = Mock()
+    monkeypatch.setattr(lambda_function, "_edit_original_response", edit)
+
+    lambda_function.handle_followup({
+        "application_id": "app-123", "token": "interaction-token", "message": "hi"
+    })
+
+    contents = [c.args[2] for c in edit.call_args_list]
+    assert contents == ["Meow", "Meow, human."]
+
+
+def lambda_handler_body(event):
+    response = lambda_function.lambda_handler(event, None)
+    assert response["statusCode"] == 200
+    return json.loads(response["body"])
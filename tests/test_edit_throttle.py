@@ -0,0 +1,40 @@
+from services.edit_throttle import EditThrottle
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_first_edit_is_due_immediately():
+    throttle = EditThrottle(min_interval=1.0, clock=FakeClock())
+    assert throttle.due()
+
+
+def test_edits_are_spaced_by_min_interval():
+    clock = FakeClock()
+    throttle = EditThrottle(min_interval=1.0, clock=clock)
+
+    throttle.mark()
+    clock.now = 0.5
+    assert not throttle.due()
+    clock.now = 1.0
+    assert throttle.due()
+    throttle.mark()
+    clock.now = 1.5
+    assert not throttle.due()
+
+
+def test_rate_limit_pushes_next_edit_out():
+    clock = FakeClock()
+    throttle = EditThrottle(min_interval=1.0, clock=clock)
+    throttle.backoff(retry_after=3.0)
+
+    clock.now = 2.0
+    assert not throttle.due()
+    clock.now = 3.0
+    assert throttle.due()
+    assert throttle.rate_limited == 1
@@ -0,0 +1,104 @@
+import json
+import random
+import urllib.error
+import urllib.request
+import pytest
+
+from scripts.fake_openai_server import FakeOpenAI, parse_latency, serve_in_background
+
+
+def _post(server, payload):
+    request = urllib.request.Request(
+        f"{server.base_url}/chat/completions",
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"}
+    )
+    return urllib.request.urlopen(request, timeout=5)
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**options):
+        server = serve_in_background(FakeOpenAI(seed=1, token_interval=0, **options))
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_latency_specs():
+    rng = random.Random(1)
+    assert parse_latency("fixed:0.5")(rng) == 0.5
+    assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+    assert parse_latency("lognormal:0.8,0.4")(rng) > 0
+    with pytest.raises(ValueError):
+        parse_latency("pareto:1")
+
+
+def test_completion_with_n_choices(serve):
+    server = serve(latency="fixed:0")
+    body = json.load(_post(server, {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "n": 3}))
+
+    assert body["object"] == "chat.completion"
+    assert len(body["choices"]) == 3
+    assert body["choices"][0]["message"]["content"]
+    assert body["usage"]["total_tokens"] > 0
+
+
+def test_stream_is_server_sent_events(serve):
+    server = serve(latency="fixed:0")
+    raw = _post(server, {"messages": [{"role": "user", "content": "hi"}], "stream": True}).read().decode()
+    events = [line[len("data: "):] for line in raw.splitlines() if line.startswith("data: ")]
+
+    assert events[-1] == "[DONE]"
+    text = "".join(
+        json.loads(event)["choices"][0]["delta"].get("content") or "" for event in events[:-1]
+    )
+    assert text.startswith(("Mrrp", "Pigeons", "*stretches*", "Sirens", "I'll"))
+
+
+def test_injected_errors_and_rate_limits(serve):
+    payload = {"messages": [{"role": "user", "content": "hi"}]}
+
+    with pytest.raises(urllib.error.HTTPError) as err:
+        _post(serve(latency="fixed:0", error_rate=1.0), payload)
+    assert err.value.code == 500
+
+    with pytest.raises(urllib.error.HTTPError) as err:
+        _post(serve(latency="fixed:0", rate_limit_rate=1.0), payload)
+    assert err.value.code == 429
+    assert float(err.value.headers["Retry-After"]) > 0
+
+
+def test_rpm_budget_returns_429_when_exhausted(serve):
+    server = serve(latency="fixed:0", rpm=60)
+    payload = {"messages": [{"role": "user", "content": "hi"}]}
+    _post(server, payload)
+
+    with pytest.raises(urllib.error.HTTPError) as err:
+        _post(server, payload)
+    assert err.value.code == 429
+    assert server.fake.stats["rate_limited"] == 1
+
+
+def test_chat_service_end_to_end(serve, monkeypatch):
+    pytest.importorskip("openai")
+    from services.chat_service import ChatService
+
+    server = serve(latency="fixed:0.01")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    service = ChatService()
+
+    result = service.generate_response_sync(user_id="1", message="are you awake?", timeout=10)
+    deltas = list(service.stream_response_sync(user_id="1", message="what are you doing?", timeout=10))
+
+    assert result["response"] and "fallback" not in result
+    assert len(deltas) > 1
+    assert server.fake.stats["requests"] == 2
+    assert server.fake.stats["streams"] == 1
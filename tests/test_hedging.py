@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+
+from services.hedging import Hedger
+
+
+def _calls(*delays, result="purr"):
+    """Factory whose n-th call sleeps delays[n] before returning"""
+    started = []
+
+    async def call():
+        delay = delays[len(started)]
+        started.append(delay)
+        await asyncio.sleep(delay)
+        return f"{result}-{len(started)}" if delay is None else f"{result}@{delay}"
+
+    return call, started
+
+
+@pytest.mark.asyncio
+async def test_fast_call_is_not_hedged():
+    hedger = Hedger(hedge_delay=0.05)
+    call, started = _calls(0.01)
+
+    assert await hedger.run(call) == "purr@0.01"
+    assert len(started) == 1
+    assert hedger.stats["hedged"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_and_backup_wins():
+    hedger = Hedger(hedge_delay=0.05)
+    call, started = _calls(1.0, 0.01)
+
+    assert await hedger.run(call) == "purr@0.01"
+    assert len(started) == 2
+    assert hedger.stats == {"calls": 1, "hedged": 1, "hedge_wins": 1}
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_to_hedge():
+    hedger = Hedger(hedge_delay=0.01)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(0.05)
+            raise RuntimeError("boom")
+        await asyncio.sleep(0.1)
+        return "purr"
+
+    assert await hedger.run(call) == "purr"
+
+
+@pytest.mark.asyncio
+async def test_disabled_hedger_makes_one_call():
+    hedger = Hedger()
+    call, started = _calls(0.05)
+
+    assert await hedger.run(call) == "purr@0.05"
+    assert len(started) == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_hedges_on_first_item():
+    hedger = Hedger(hedge_delay=0.05)
+    closed = []
+
+    def factory():
+        index = len(closed) + 1
+        closed.append(False)
+
+        async def stream():
+            try:
+                await asyncio.sleep(1.0 if index == 1 else 0.01)
+                for word in ("slow", "down"):
+                    yield f"{word}{index}"
+            finally:
+                closed[index - 1] = True
+
+        return stream()
+
+    items = [item async for item in hedger.stream(factory)]
+
+    assert items == ["slow2", "down2"]
+    assert closed == [True, True]
+    assert hedger.stats["hedge_wins"] == 1
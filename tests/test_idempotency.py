@@ -0,0 +1,136 @@
+import json
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+import lambda_function
+from services.idempotency_service import IdempotencyService
+
+
+def test_duplicate_gets_stored_response():
+    dedupe = IdempotencyService()
+    assert dedupe.claim("1") == (True, None)
+    dedupe.complete("1", "body")
+
+    assert dedupe.claim("1") == (False, "body")
+    assert dedupe.stats["replayed"] == 1
+
+
+def test_duplicate_joins_in_flight_owner():
+    dedupe = IdempotencyService()
+    dedupe.claim("1")
+    threading.Timer(0.05, dedupe.complete, args=("1", "late body")).start()
+
+    assert dedupe.claim("1", wait=2.0) == (False, "late body")
+
+
+def test_claims_are_shared_across_containers_through_redis(sync_redis_client):
+    first, second = IdempotencyService(sync_redis_client), IdempotencyService(sync_redis_client)
+
+    assert first.claim("1") == (True, None)
+    first.complete("1", "body")
+    assert second.claim("1") == (False, "body")
+
+
+class UnreachableRedis:
+    """Redis that times out on every command"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.calls += 1
+            raise TimeoutError("Timeout reading from socket")
+        return command
+
+
+def test_redis_is_skipped_after_a_failure():
+    redis_client = UnreachableRedis()
+    dedupe = IdempotencyService(redis_client)
+
+    assert dedupe.claim("1") == (True, None)
+    dedupe.complete("1", "body")
+    assert dedupe.claim("2") == (True, None)
+
+    assert redis_client.calls == 1
+    assert dedupe.stats["redis_errors"] == 1
+    assert dedupe.claim("1") == (False, "body")
+
+
+def test_lambda_redis_client_fails_fast(monkeypatch):
+    pytest.importorskip("redis")
+    monkeypatch.setenv("REDIS_HOST", "dedupe-fail-fast.invalid")
+    client = lambda_function._get_redis_client()
+
+    kwargs = client.connection_pool.connection_kwargs
+    assert kwargs["socket_timeout"] < 1 and kwargs["socket_connect_timeout"] < 1
+    assert kwargs["retry"]._retries == 0
+
+
+def test_remote_release_lets_a_retry_run_in_another_container(sync_redis_client):
+    owner, other = IdempotencyService(sync_redis_client), IdempotencyService(sync_redis_client)
+    assert owner.claim("1") == (True, None)
+    assert other.claim("1") == (False, None)
+
+    owner.release("1")
+
+    assert other.claim("1") == (True, None)
+
+
+def test_release_lets_a_retry_run():
+    dedupe = IdempotencyService()
+    dedupe.claim("1")
+    dedupe.release("1")
+    assert dedupe.claim("1") == (True, None)
+
+
+def test_retried_chat_does_not_generate_twice(monkeypatch):
+    dedupe = IdempotencyService()
+    monkeypatch.setattr(lambda_function, "CHAT_RESPONSE_MODE", "sync")
+    monkeypatch.setattr(lambda_function, "_get_idempotency_service", lambda: dedupe)
+    generate = Mock(return_value="purr")
+    monkeypatch.setattr(lambda_function, "_generate_chat_reply", generate)
+    body = {"id": "42", "type": 2, "data": {"name": "chat", "options": [{"value": "hi"}]}}
+
+    first = lambda_function.dispatch_command(body)
+    retry = lambda_function.dispatch_command(body)
+
+    assert first == retry
+    assert json.loads(retry)["data"]["content"] == "purr"
+    generate.assert_called_once()
+
+
+def test_failed_chat_is_not_replayed_to_a_retry(monkeypatch):
+    dedupe = IdempotencyService()
+    monkeypatch.setattr(lambda_function, "CHAT_RESPONSE_MODE", "sync")
+    monkeypatch.setattr(lambda_function, "_get_idempotency_service", lambda: dedupe)
+    generate = Mock(side_effect=[RuntimeError("model down"), "purr"])
+    monkeypatch.setattr(lambda_function, "_generate_chat_reply", generate)
+    body = {"id": "43", "type": 2, "data": {"name": "chat", "options": [{"value": "hi"}]}}
+
+    first = lambda_function.dispatch_command(body)
+    retry = lambda_function.dispatch_command(body)
+
+    assert json.loads(first)["data"]["content"] == "Meow? Something went wrong with the chat!"
+    assert json.loads(retry)["data"]["content"] == "purr"
+    assert generate.call_count == 2
+    assert lambda_function.dispatch_command(body) == retry
+
+
+def test_bad_redis_config_falls_back_to_memory_dedupe(monkeypatch):
+    monkeypatch.setenv("REDIS_HOST", "redis.internal")
+    monkeypatch.setenv("REDIS_PORT", "not-a-port")
+    monkeypatch.setattr(lambda_function, "CHAT_RESPONSE_MODE", "sync")
+    generate = Mock(return_value="purr")
+    monkeypatch.setattr(lambda_function, "_generate_chat_reply", generate)
+    body = {"id": "44", "type": 2, "data": {"name": "chat", "options": [{"value": "hi"}]}}
+
+    first = lambda_function.dispatch_command(body)
+    retry = lambda_function.dispatch_command(body)
+
+    assert json.loads(first)["data"]["content"] == "purr"
+    assert retry == first
+    generate.assert_called_once()
+    assert lambda_function._get_idempotency_service().redis_client is None
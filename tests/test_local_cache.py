@@ -0,0 +1,65 @@
+from services.local_cache import MISSING, LocalCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hit_and_miss_counts():
+    cache = LocalCache()
+    assert cache.get("chat:1") is MISSING
+    cache.set("chat:1", {"response": "purr"})
+
+    assert cache.get("chat:1") == {"response": "purr"}
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+
+def test_ttl_is_capped_by_cache_ttl_and_caller_ttl():
+    clock = FakeClock()
+    cache = LocalCache(ttl=30, clock=clock)
+    cache.set("long", 1, ttl=3600)
+    cache.set("short", 2, ttl=5)
+
+    clock.now = 6
+    assert cache.get("short") is MISSING
+    assert cache.get("long") == 1
+    clock.now = 31
+    assert cache.get("long") is MISSING
+    assert len(cache) == 0
+
+
+def test_zero_ttl_is_not_stored():
+    cache = LocalCache()
+    cache.set("gone", 1, ttl=0)
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = LocalCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.stats["evictions"] == 1
+
+
+def test_delete_and_pattern_invalidation():
+    cache = LocalCache()
+    for key in ("chat:1", "chat:2", "decree:1"):
+        cache.set(key, key)
+
+    cache.delete(["chat:1"])
+    cache.delete_matching("*decree*")
+
+    assert cache.get("chat:1") is MISSING
+    assert cache.get("decree:1") is MISSING
+    assert cache.get("chat:2") == "chat:2"
+    assert cache.stats["invalidations"] == 2
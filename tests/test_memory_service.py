@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import pytest
+
+from services.memory_service import HISTORY_LENGTH, MemoryService
+from services.write_behind import WriteBehindBuffer
+
+
+class SlowDynamo:
+    """batch_write_item stand-in that blocks until released"""
+
+    def __init__(self):
+        self.items = []
+        self.release = threading.Event()
+
+    def batch_write_item(self, RequestItems):
+        self.release.wait(2)
+        for request in RequestItems["chats"]:
+            self.items.append(request["PutRequest"]["Item"])
+        return {}
+
+
+@pytest.fixture
+def memory(redis_client):
+    dynamo = SlowDynamo()
+    writer = WriteBehindBuffer(dynamo, "chats", background=False)
+    service = MemoryService(redis_client=redis_client, table=object(), writer=writer)
+    service.dynamo = dynamo
+    return service
+
+
+@pytest.mark.asyncio
+async def test_history_write_is_one_transactional_round_trip(memory):
+    await memory.store_interaction("u1", "hello", "mrrp", "discord")
+
+    assert memory.redis_client.round_trips == 1
+    assert memory.redis_client.transactions == 1
+    history = await memory.get_chat_history("u1")
+    assert history == [{"role": "assistant", "content": "mrrp"}, {"role": "user", "content": "hello"}]
+    memory.dynamo.release.set()
+    await memory.flush()
+
+
+@pytest.mark.asyncio
+async def test_history_is_trimmed(memory):
+    memory.dynamo.release.set()
+    for i in range(HISTORY_LENGTH):
+        await memory.store_interaction("u1", f"q{i}", f"a{i}", "discord")
+
+    history = await memory.get_chat_history("u1")
+    assert len(history) == HISTORY_LENGTH
+    assert history[0]["content"] == f"a{HISTORY_LENGTH - 1}"
+    await memory.flush()
+
+
+@pytest.mark.asyncio
+async def test_dynamodb_write_does_not_block_the_reply(memory):
+    await asyncio.wait_for(memory.store_interaction("u1", "hello", "mrrp", "discord"), 0.5)
+    assert memory.dynamo.items == []
+    assert len(memory.writer) == 1
+
+    memory.dynamo.release.set()
+    await memory.flush()
+    assert memory.dynamo.items[0]["message"] == "hello"
+    assert memory.dynamo.items[0]["response"] == "mrrp"
@@ -0,0 +1,71 @@
+from services.model_router import FAST, GREETING, LARGE, STANDARD, ModelRouter, router_from_env
+
+
+def test_bare_greetings_skip_the_model():
+    router = ModelRouter()
+    for message in ["hi", "Hey!!", "good morning", "hello Crème Brûlée"]:
+        assert router.route(message) is GREETING
+
+
+def test_greeting_with_history_goes_to_the_model():
+    router = ModelRouter()
+    assert router.route("hi", history=[{"role": "user", "content": "remember me?"}]) is STANDARD
+
+
+def test_short_chit_chat_uses_fast_tier():
+    assert ModelRouter().route("do you like pigeons") is FAST
+
+
+def test_large_tier_needs_several_signals():
+    router = ModelRouter()
+    assert router.route("Explain step by step how radiators work. Why do they clank? Is it the pipes?") is LARGE
+    assert router.route("explain this:\n```\ndef purr(): pass\n```") is LARGE
+    assert router.route("Summarize this: " + " ".join(["meow"] * 61)) is LARGE
+
+
+def test_single_signal_stays_on_standard():
+    router = ModelRouter()
+    assert router.route("Explain why radiators clank") is STANDARD
+    assert router.route("Is it cold? Is it warm?") is STANDARD
+    assert router.route(" ".join(["meow"] * 61)) is STANDARD
+
+
+def test_short_why_and_what_questions_stay_cheap():
+    router = ModelRouter()
+    for message in ["why are you a cat??", "what is your favorite food?", "why?", "what do you want", "can you write"]:
+        assert router.route(message) is FAST, message
+    assert router.route("why do you always sit on my keyboard when i am trying to work from home?") is STANDARD
+
+
+def test_medium_prompt_uses_standard_tier():
+    message = "i got a new couch today and my roommate says the cat will hate it but i think you will love it"
+    assert ModelRouter().route(message) is STANDARD
+
+
+def test_disabled_router_always_uses_standard():
+    router = ModelRouter(enabled=False)
+    assert router.route("hi") is STANDARD
+    assert router.route("Explain everything") is STANDARD
+
+
+def test_record_accumulates_reported_usage():
+    router = ModelRouter()
+    fields = router.record(FAST, 0.0, usage={"prompt_tokens": 120, "completion_tokens": 30})
+    router.record(FAST, 0.0, usage={"prompt_tokens": 100, "completion_tokens": 20})
+    router.record(FAST, 0.0)
+    router.record(GREETING, 0.0, tokens_saved=100)
+
+    assert fields["route"] == "fast"
+    assert fields["completion_tokens"] == 30
+    assert router.stats["fast"]["count"] == 3
+    assert router.stats["fast"]["prompt_tokens"] == 220
+    assert router.stats["fast"]["completion_tokens"] == 50
+    assert router.stats["greeting"]["tokens_saved"] == 100
+
+
+def test_router_from_env(monkeypatch):
+    monkeypatch.setenv("MODEL_ROUTING", "true")
+    monkeypatch.setenv("CHAT_LARGE_MODEL", "gpt-4.1")
+    router = router_from_env()
+    assert router.enabled
+    assert router.large.model == "gpt-4.1"
@@ -0,0 +1,42 @@
+import json
+import logging
+
+from services.request_log import RequestLog, annotate
+
+
+def _lines(caplog):
+    return [json.loads(r.getMessage()) for r in caplog.records if r.name == "test.requests"]
+
+
+def test_one_json_line_per_request(caplog):
+    caplog.set_level(logging.INFO, logger="test.requests")
+    request_log = RequestLog(logging.getLogger("test.requests"))
+
+    record = request_log.start(kind="interaction")
+    annotate(command="decree")
+    record.mark("verify_ms")
+    record.set(status=200)
+    record.emit()
+
+    (line,) = _lines(caplog)
+    assert line["command"] == "decree"
+    assert set(line["timings"]) == {"verify_ms", "total_ms"}
+
+
+def test_successes_are_sampled_but_errors_always_logged(caplog):
+    caplog.set_level(logging.INFO, logger="test.requests")
+    request_log = RequestLog(logging.getLogger("test.requests"), sample_rate=0.5, rng=lambda: 0.9)
+
+    ok = request_log.start()
+    ok.set(status=200)
+    ok.emit()
+    failed = request_log.start()
+    failed.set(status=500)
+    failed.emit()
+
+    assert [line["status"] for line in _lines(caplog)] == [500]
+    assert request_log.stats == {"emitted": 1, "sampled_out": 1}
+
+
+def test_annotate_outside_a_request_is_a_noop():
+    annotate(ignored=True)
@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+
+from services.resilience import (
+    CLOSED, HALF_OPEN, OPEN,
+    AdaptiveLimiter, BackendGuard, BackendUnavailable, CircuitBreaker
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_limiter_grows_on_fast_calls_and_backs_off_on_slow():
+    limiter = AdaptiveLimiter(initial=10, target_latency=1.0, backoff=0.5)
+    limiter.inflight = 1
+    limiter.release(latency=0.1)
+    assert limiter.limit == pytest.approx(10.1)
+
+    limiter.inflight = 1
+    limiter.release(latency=2.0)
+    assert limiter.limit == pytest.approx(5.05)
+
+    limiter.inflight = 1
+    limiter.release(failed=True)
+    assert limiter.limit == pytest.approx(2.525)
+
+
+def test_limiter_never_drops_below_minimum():
+    limiter = AdaptiveLimiter(initial=3, min_limit=2, backoff=0.1)
+    limiter.inflight = 1
+    limiter.release(failed=True)
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_rejects_callers_over_the_limit():
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, max_wait=0.05)
+    await limiter.acquire()
+
+    with pytest.raises(BackendUnavailable) as err:
+        await limiter.acquire()
+
+    assert err.value.reason == "overloaded"
+    assert limiter.stats["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_limiter_waiter_gets_released_slot():
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, max_wait=1.0)
+    await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    limiter.release(latency=0.1)
+    await asyncio.wait_for(waiter, 0.5)
+    assert limiter.inflight == 1
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=FakeClock())
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats["short_circuited"] == 1
+
+
+def test_breaker_half_open_trial_closes_or_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, half_open_max=1, clock=clock)
+    breaker.record_failure()
+
+    clock.now = 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_guard_fails_fast_while_open():
+    guard = BackendGuard(AdaptiveLimiter(), CircuitBreaker(failure_threshold=2))
+    calls = []
+
+    async def backend():
+        async with guard.slot():
+            calls.append(1)
+            raise RuntimeError("502")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await backend()
+    with pytest.raises(BackendUnavailable) as err:
+        await backend()
+
+    assert err.value.reason == "circuit_open"
+    assert len(calls) == 2
+    assert guard.limiter.inflight == 0
+    assert guard.snapshot()["circuit_state"] == OPEN
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_does_not_count_as_failure():
+    guard = BackendGuard(AdaptiveLimiter(initial=10), CircuitBreaker(failure_threshold=1))
+
+    async def slow():
+        async with guard.slot():
+            await asyncio.sleep(1)
+
+    task = asyncio.ensure_future(slow())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert guard.breaker.state == CLOSED
+    assert guard.limiter.limit == 10
+    assert guard.limiter.inflight == 0
@@ -0,0 +1,92 @@
+import asyncio
+import itertools
+import pytest
+
+from services.response_pool import ResponsePool
+
+
+class FakeBatches:
+    """generate_batch stand-in returning numbered decrees"""
+
+    def __init__(self, replies=None):
+        self.counter = itertools.count(1)
+        self.replies = replies
+        self.calls = []
+
+    async def __call__(self, n):
+        self.calls.append(n)
+        if self.replies is not None:
+            return list(self.replies)
+        return [f"Decree #{next(self.counter)}" for _ in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_fill_uses_batches_up_to_target():
+    batches = FakeBatches()
+    pool = ResponsePool(batches, target=12, batch_size=5)
+
+    await pool.fill()
+
+    assert len(pool) == 12
+    assert batches.calls == [5, 5, 2]
+
+
+@pytest.mark.asyncio
+async def test_pop_is_fifo_and_refills_at_low_water():
+    batches = FakeBatches()
+    pool = ResponsePool(batches, target=4, low_water=2, batch_size=4)
+    await pool.fill()
+
+    assert pool.pop() == "Decree #1"
+    assert pool.pop() == "Decree #2"
+    assert pool.pop() == "Decree #3"  # at low water: refill scheduled
+    await pool.request_refill()
+
+    assert len(pool) == 4
+    assert pool.stats["batches"] == 2
+
+
+@pytest.mark.asyncio
+async def test_empty_pool_returns_none():
+    pool = ResponsePool(FakeBatches(), target=2)
+    assert pool.pop() is None
+    assert pool.stats["empty"] == 1
+    await pool.request_refill()
+    assert len(pool) == 2
+
+
+@pytest.mark.asyncio
+async def test_duplicates_of_pooled_and_recent_replies_are_dropped():
+    pool = ResponsePool(FakeBatches(), target=10, low_water=0)
+    assert pool.add(["No naps before noon.", "no naps before NOON!", "All pigeons are banned."]) == 2
+    served = pool.pop()
+
+    assert pool.add([served, "Treats at dawn."]) == 1
+    assert pool.stats["duplicates"] == 2
+
+
+@pytest.mark.asyncio
+async def test_refill_stops_when_only_duplicates_come_back():
+    batches = FakeBatches(replies=["Same decree."])
+    pool = ResponsePool(batches, target=5)
+
+    await pool.fill()
+
+    assert len(pool) == 1
+    assert len(batches.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_background_loop_waits_for_quiet_backend():
+    quiet = {"value": False}
+    batches = FakeBatches()
+    pool = ResponsePool(batches, target=3, interval=0.01, is_quiet=lambda: quiet["value"])
+    pool.start()
+
+    await asyncio.sleep(0.05)
+    assert batches.calls == []
+
+    quiet["value"] = True
+    await asyncio.sleep(0.05)
+    await pool.stop()
+    assert len(pool) == 3
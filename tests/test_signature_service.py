@@ -0,0 +1,43 @@
+import time
+import pytest
+
+signing = pytest.importorskip("nacl.signing")
+
+from services.signature_service import SignatureService, find_header
+
+
+@pytest.fixture
+def signed_request():
+    signing_key = signing.SigningKey.generate()
+    body = b'{"type": 1}'
+    timestamp = str(int(time.time()))
+    signature = signing_key.sign(timestamp.encode() + body).signature.hex()
+    headers = {"X-Signature-Ed25519": signature, "X-Signature-Timestamp": timestamp}
+    return signing_key.verify_key.encode().hex(), headers, body
+
+
+def test_valid_signature(signed_request):
+    public_key, headers, body = signed_request
+    assert SignatureService(public_key).verify(headers, body) is True
+
+
+def test_tampered_body_rejected(signed_request):
+    public_key, headers, body = signed_request
+    assert SignatureService(public_key).verify(headers, body + b" ") is False
+
+
+def test_stale_timestamp_rejected_before_crypto(signed_request, mocker):
+    """Replayed requests fail the window check without touching the key"""
+    public_key, headers, body = signed_request
+    service = SignatureService(public_key, max_age=5)
+    service.verify_key = mocker.Mock()
+
+    assert service.verify(headers, body, now=time.time() + 60) is False
+    service.verify_key.verify.assert_not_called()
+
+
+def test_header_lookup_is_case_insensitive():
+    headers = {"x-signature-ed25519": "a", "X-SIGNATURE-TIMESTAMP": "b"}
+    assert find_header(headers, "X-Signature-Ed25519") == "a"
+    assert find_header(headers, "X-Signature-Timestamp") == "b"
+    assert find_header(headers, "X-Missing") is None
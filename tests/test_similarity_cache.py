@@ -0,0 +1,41 @@
+import time
+
+from services.similarity_cache import SimilarityCache, normalize_message
+
+
+def test_normalization_ignores_case_punctuation_and_spacing():
+    assert normalize_message("  Are you HUNGRY?? ") == "are you hungry"
+
+
+def test_near_duplicate_prompt_hits():
+    cache = SimilarityCache(threshold=0.7)
+    cache.put("what is your favorite food", {"response": "Tuna. Obviously. 😾"})
+
+    hit = cache.get("whats your favorite food?")
+
+    assert hit is not None
+    response, score = hit
+    assert response["response"].startswith("Tuna")
+    assert 0.7 <= score < 1.0
+
+
+def test_unrelated_prompt_misses():
+    cache = SimilarityCache()
+    cache.put("are you hungry", {"response": "Always."})
+    assert cache.get("do you like baths") is None
+    assert cache.stats["misses"] == 1
+
+
+def test_namespaces_are_isolated():
+    cache = SimilarityCache()
+    cache.put("are you hungry", {"response": "Always."}, namespace="persona-v1")
+    assert cache.get("are you hungry", namespace="persona-v2") is None
+
+
+def test_entries_expire_and_are_bounded():
+    cache = SimilarityCache(max_entries=2, ttl=0.01)
+    for text in ("one fish", "two fish", "red fish"):
+        cache.put(text, {"response": text})
+    assert len(cache) == 2
+    time.sleep(0.02)
+    assert cache.get("red fish") is None
@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+
+from services.single_flight import SingleFlight, request_key
+
+
+def _params(text):
+    return {"model": "m", "temperature": 0.8, "messages": [{"role": "user", "content": text}]}
+
+
+def test_request_key_normalizes_prompt_but_not_params():
+    assert request_key(_params("Are you  hungry?")) == request_key(_params("are you hungry? "))
+    assert request_key(_params("hi")) != request_key(dict(_params("hi"), temperature=0.2))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_collapse():
+    flight = SingleFlight()
+    calls = 0
+
+    async def complete():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"response": "meow"}
+
+    results = await asyncio.gather(*[flight.do("k", complete) for _ in range(5)])
+
+    assert calls == 1
+    assert [shared for _, shared in results].count(True) == 4
+    assert flight.stats["collapsed"] == 4
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model down")
+
+    results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_when_leader_is_cancelled():
+    flight = SingleFlight()
+    calls = 0
+
+    async def complete():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"response": "meow"}
+
+    leader = asyncio.ensure_future(flight.do("k", complete))
+    await asyncio.sleep(0)
+    followers = [asyncio.ensure_future(flight.do("k", complete)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    results = await asyncio.gather(*followers)
+
+    assert all(result == {"response": "meow"} for result, _ in results)
+    assert [shared for _, shared in results].count(False) == 1
+    assert calls == 2
+    assert flight.stats["takeovers"] == 3
+
+
+@pytest.mark.asyncio
+async def test_cancelled_follower_does_not_disturb_the_leader():
+    flight = SingleFlight()
+
+    async def complete():
+        await asyncio.sleep(0.05)
+        return {"response": "meow"}
+
+    leader = asyncio.ensure_future(flight.do("k", complete))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("k", complete))
+    await asyncio.sleep(0.01)
+    follower.cancel()
+
+    assert await leader == ({"response": "meow"}, False)
+    with pytest.raises(asyncio.CancelledError):
+        await follower
+
+
+@pytest.mark.asyncio
+async def test_collapses_across_processes_through_redis(redis_client):
+    first, second = SingleFlight(redis_client, poll_interval=0.01), SingleFlight(redis_client, poll_interval=0.01)
+    calls = 0
+
+    async def complete():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"response": "meow"}
+
+    (a, _), (b, shared) = await asyncio.gather(first.do("k", complete), second.do("k", complete))
+
+    assert a == b == {"response": "meow"}
+    assert calls == 1 and shared is True
+    assert second.stats["remote_collapsed"] == 1
@@ -0,0 +1,43 @@
+from services.token_budget import TokenBudget
+
+
+def _history(n, size=40):
+    # Newest first, as MemoryService returns it
+    return [
+        {"role": "assistant" if i % 2 else "user", "content": f"turn {n - i} " + "x" * size}
+        for i in range(n)
+    ]
+
+
+def test_system_prompt_cost_is_precomputed():
+    budget = TokenBudget("You are a cat.")
+    assert budget.system_tokens == budget.counter.count_message(budget.system_message)
+
+
+def test_history_is_fit_newest_first_and_returned_in_order():
+    budget = TokenBudget("You are a cat.", input_budget=120)
+    history = _history(10)
+
+    messages, prompt_tokens = budget.build("hello", history)
+
+    kept = messages[1:-1]
+    assert 0 < len(kept) < 10
+    # The newest turns survive and come back oldest-first
+    assert kept[-1]["content"] == history[0]["content"]
+    assert kept == [dict(t) for t in reversed(history[:len(kept)])]
+    assert prompt_tokens <= 120
+    assert budget.stats["last_prompt_tokens"] == prompt_tokens
+
+
+def test_oversized_turns_are_truncated():
+    budget = TokenBudget("You are a cat.", input_budget=2000, max_turn_tokens=20)
+    messages, _ = budget.build("hi", [{"role": "user", "content": "meow " * 500}])
+
+    turn = messages[1]["content"]
+    assert turn.endswith("…")
+    assert budget.counter.count(turn) <= 20
+
+
+def test_no_history():
+    messages, _ = TokenBudget("You are a cat.").build("hi")
+    assert [m["role"] for m in messages] == ["system", "user"]
@@ -0,0 +1,55 @@
+import json
+import logging
+
+import pytest
+from unittest.mock import Mock
+
+import lambda_function
+
+
+@pytest.mark.parametrize("event", [
+    {"warmup": True},
+    {"source": "serverless-plugin-warmup"},
+    {"source": "aws.events", "detail-type": "Scheduled Event", "detail": {}},
+])
+def test_warmup_event_initializes_clients(event, monkeypatch):
+    """Warm-up pings build clients and skip the interaction path"""
+    verify = Mock()
+    chat = Mock(return_value=object())
+    monkeypatch.setattr(lambda_function, "verify_signature", verify)
+    monkeypatch.setattr(lambda_function, "_get_chat_service", chat)
+    monkeypatch.setattr(lambda_function, "_get_lambda_client", Mock(return_value=object()))
+    monkeypatch.delenv("REDIS_HOST", raising=False)
+
+    result = lambda_function.lambda_handler(event, None)
+
+    assert result["warmup"] is True
+    assert {"signature", "chat_service", "lambda"} <= set(result["initialized"])
+    chat.assert_called_once()
+    verify.assert_not_called()
+
+
+def test_warmup_failures_are_reported_not_raised(monkeypatch):
+    monkeypatch.setattr(lambda_function, "_get_chat_service", Mock(side_effect=ValueError("no key")))
+    monkeypatch.setattr(lambda_function, "_get_lambda_client", Mock(return_value=object()))
+
+    result = lambda_function.lambda_handler({"warmup": True}, None)
+
+    assert "chat_service" in result["failed"]
+
+
+def test_interactions_are_not_mistaken_for_warmup():
+    assert not lambda_function.is_warmup_event({"headers": {}, "body": "{\"type\": 1}"})
+
+
+def test_warmup_logs_command_counters(monkeypatch, caplog):
+    caplog.set_level(logging.INFO)
+    monkeypatch.setattr(lambda_function, "_get_chat_service", Mock(return_value=object()))
+    monkeypatch.setattr(lambda_function, "_get_lambda_client", Mock(return_value=object()))
+    monkeypatch.setattr(lambda_function.request_log, "sample_rate", 1.0)
+
+    lambda_function.lambda_handler({"warmup": True}, None)
+
+    (line,) = [json.loads(r.getMessage()) for r in caplog.records if r.getMessage().startswith("{")]
+    assert line["kind"] == "warmup"
+    assert line["commands"] == lambda_function.router.stats()
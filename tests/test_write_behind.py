@@ -0,0 +1,150 @@
+import time
+
+from services.write_behind import WriteBehindBuffer
+
+
+class ClientError(Exception):
+    """Shaped like botocore's ClientError"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code, "Message": code}}
+
+
+class FakeDynamo:
+    """batch_write_item stand-in that can leave items unprocessed or throttle"""
+
+    def __init__(self, unprocessed_rounds=0, errors=0, error="ProvisionedThroughputExceededException"):
+        self.calls = []
+        self.unprocessed_rounds = unprocessed_rounds
+        self.errors = errors
+        self.error = error
+
+    def batch_write_item(self, RequestItems):
+        self.calls.append(RequestItems)
+        if self.errors:
+            self.errors -= 1
+            raise ClientError(self.error)
+        (table, requests), = RequestItems.items()
+        if self.unprocessed_rounds:
+            self.unprocessed_rounds -= 1
+            return {"UnprocessedItems": {table: requests[len(requests) // 2:]}}
+        return {"UnprocessedItems": {}}
+
+
+def _item(i, user="u1"):
+    return {"user_id": user, "timestamp": i, "message": f"m{i}"}
+
+
+def _buffer(dynamo, **options):
+    options.setdefault("background", False)
+    return WriteBehindBuffer(dynamo, "chats", sleep=lambda s: None, **options)
+
+
+def test_flush_writes_chunks_of_25():
+    dynamo = FakeDynamo()
+    buffer = _buffer(dynamo)
+    for i in range(60):
+        buffer.add(_item(i))
+
+    buffer.flush()
+
+    assert [len(call["chats"]) for call in dynamo.calls] == [25, 25, 10]
+    assert buffer.stats["written"] == 60
+    assert len(buffer) == 0
+
+
+def test_unprocessed_items_are_retried_with_backoff():
+    dynamo = FakeDynamo(unprocessed_rounds=2)
+    delays = []
+    buffer = WriteBehindBuffer(dynamo, "chats", sleep=delays.append, rng=lambda: 1.0, background=False)
+    for i in range(8):
+        buffer.add(_item(i))
+
+    buffer.flush()
+
+    assert [len(call["chats"]) for call in dynamo.calls] == [8, 4, 2]
+    assert buffer.stats["written"] == 8
+    assert buffer.stats["retries"] == 2
+    assert delays == [0.1, 0.2]
+
+
+def test_throttling_is_retried_then_dropped():
+    dynamo = FakeDynamo(errors=10)
+    buffer = _buffer(dynamo, max_retries=2)
+    buffer.add(_item(1))
+
+    buffer.flush()
+
+    assert len(dynamo.calls) == 3
+    assert buffer.stats["failed"] == 1
+
+
+def test_non_retryable_errors_drop_the_chunk_immediately():
+    delays = []
+    dynamo = FakeDynamo(errors=10, error="ValidationException")
+    buffer = WriteBehindBuffer(dynamo, "chats", sleep=delays.append, background=False)
+    buffer.add(_item(1))
+    buffer.add(_item(2))
+
+    buffer.flush()
+
+    assert len(dynamo.calls) == 1
+    assert delays == []
+    assert buffer.stats["failed"] == 2
+    assert buffer.stats["retries"] == 0
+
+
+def test_connection_errors_are_retried():
+    dynamo = FakeDynamo()
+    attempts = []
+
+    def flaky(RequestItems):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionResetError("connection reset by peer")
+        return {"UnprocessedItems": {}}
+
+    dynamo.batch_write_item = flaky
+    buffer = _buffer(dynamo)
+    buffer.add(_item(1))
+
+    buffer.flush()
+
+    assert len(attempts) == 2
+    assert buffer.stats["written"] == 1
+
+
+def test_duplicate_keys_in_a_chunk_keep_the_last_write():
+    dynamo = FakeDynamo()
+    buffer = _buffer(dynamo)
+    buffer.add(_item(1))
+    buffer.add(dict(_item(1), message="edited"))
+
+    buffer.flush()
+
+    requests = dynamo.calls[0]["chats"]
+    assert [r["PutRequest"]["Item"]["message"] for r in requests] == ["edited"]
+
+
+def test_background_thread_flushes_on_size_and_time():
+    dynamo = FakeDynamo()
+    buffer = WriteBehindBuffer(dynamo, "chats", flush_interval=0.05)
+    for i in range(25):
+        buffer.add(_item(i))
+    buffer.add(_item(99, user="u2"))
+
+    deadline = time.monotonic() + 1
+    while buffer.stats["written"] < 26 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    buffer.close()
+
+    assert buffer.stats["written"] == 26
+
+
+def test_close_drains_the_buffer():
+    dynamo = FakeDynamo()
+    buffer = WriteBehindBuffer(dynamo, "chats", flush_interval=60)
+    buffer.add(_item(1))
+    buffer.close()
+    assert buffer.stats["written"] == 1